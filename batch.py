@@ -0,0 +1,207 @@
+"""
+Batch Palette Generation for Prismo
+Generates palettes for a folder or glob of images in parallel across CPU cores
+"""
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from json import loads, dumps
+from os import path
+
+
+# File extensions picked up when a folder is given as the batch source
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp', '.tif', '.tiff'}
+
+
+def collect_images(source):
+    """
+    Expand a folder or glob pattern into a sorted list of image paths.
+
+    Args:
+        source (str): Folder path (searched recursively) or glob pattern
+
+    Returns:
+        list: Absolute paths of matching image files
+    """
+    source = path.expandvars(path.expanduser(source))
+    if path.isdir(source):
+        matches = glob.glob(path.join(source, '**', '*'), recursive=True)
+        matches = [m for m in matches if path.splitext(m)[1].lower() in IMAGE_EXTENSIONS]
+    else:
+        matches = glob.glob(source, recursive=True)
+    return sorted(path.abspath(m) for m in matches if path.isfile(m))
+
+
+def extract_palette(img, light_mode, backend, max_pixels):
+    """
+    Worker: extract the colors.json structure for a single image.
+
+    Returns:
+        tuple: (img, colors dict or None, error message or None)
+    """
+    import pywal
+    from main import get_backend
+    from image_utils import working_copy
+
+    try:
+        with working_copy(img, max_pixels) as work_img:
+            colors = get_backend(backend).get(work_img, light_mode, prescaled=bool(max_pixels and max_pixels > 0))
+        wal = pywal.colors.colors_to_dict(pywal.colors.saturate_colors(colors, ""), img)
+        return img, wal, None
+    except (Exception, SystemExit) as e:
+        # pywal's ImageMagick backend calls sys.exit() on failure; keep it inside the worker
+        return img, None, str(e) or type(e).__name__
+
+
+def source_root(source):
+    """
+    Folder that image paths are made relative to: the folder itself, or the part of a
+    glob pattern before its first wildcard.
+
+    Args:
+        source (str): Folder path or glob pattern (as given to collect_images)
+
+    Returns:
+        str: Absolute folder path
+    """
+    source = path.expandvars(path.expanduser(source))
+    if path.isdir(source):
+        return path.abspath(source)
+    parts = []
+    for part in path.normpath(source).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return path.abspath(os.sep.join(parts) or '.')
+
+
+def _per_image_path(output, root, img):
+    """
+    Output path for an image when writing one colors.json per image.
+
+    The image's subfolders below the source are kept, so images with the same name
+    in different folders don't overwrite each other.
+    """
+    rel = path.relpath(img, root)
+    if rel.startswith(os.pardir):
+        # Outside the source root (e.g. a symlinked folder): fall back to a flattened absolute path
+        rel = path.splitdrive(img)[1].lstrip('\\/').replace(':', '')
+    return path.join(output, rel + '.json')
+
+
+def _is_done(target, light_mode, backend):
+    """Whether a per-image file exists and was generated with these settings (for resuming)"""
+    if not path.isfile(target):
+        return False
+    try:
+        with open(target, 'r', encoding='utf-8') as f:
+            record = loads(f.read())
+    except ValueError:
+        return False
+    return record.get("light_mode") == light_mode and record.get("backend") == backend
+
+
+def _load_done(output, light_mode, backend):
+    """Read the set of images already processed with these settings (for resuming)"""
+    done = set()
+    if not path.isfile(output):
+        return done
+    with open(output, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = loads(line)
+            except ValueError:
+                # Partial line from an interrupted run
+                continue
+            if record.get("light_mode") == light_mode and record.get("backend") == backend:
+                done.add(record["image"])
+    return done
+
+
+def run_batch(source, output, light_mode=False, backend="wal", max_pixels=None, workers=None):
+    """
+    Generate palettes for many images using a process pool.
+
+    Results are written as they complete, so an interrupted run can be restarted
+    and images that are already done are skipped.
+
+    Args:
+        source (str): Folder or glob pattern of images
+        output (str): A .jsonl file (one record per image) or a folder (one <image>.json per image,
+                      mirroring the image's subfolders below the source)
+        light_mode (bool): Generate light mode color schemes
+        backend (str): Palette extraction backend name
+        max_pixels (int or None): Pixel budget for the extraction working copy (None = default)
+        workers (int or None): Number of worker processes (None = CPU count)
+
+    Returns:
+        dict: {"succeeded": [img, ...], "skipped": [img, ...], "failed": [{"name": img, "error": msg}, ...]}
+    """
+    from image_utils import DEFAULT_MAX_PIXELS
+
+    if max_pixels is None:
+        max_pixels = DEFAULT_MAX_PIXELS
+
+    results = {"succeeded": [], "skipped": [], "failed": []}
+    images = collect_images(source)
+    if not images:
+        print("No images found for: " + source)
+        return results
+
+    output = path.abspath(path.expandvars(path.expanduser(output)))
+    jsonl = output.lower().endswith('.jsonl')
+
+    # Skip images finished by a previous (possibly interrupted) run
+    if jsonl:
+        done = _load_done(output, light_mode, backend)
+        pending = [img for img in images if img not in done]
+        os.makedirs(path.dirname(output), exist_ok=True)
+    else:
+        os.makedirs(output, exist_ok=True)
+        root = source_root(source)
+        pending = [img for img in images if not _is_done(_per_image_path(output, root, img), light_mode, backend)]
+    pending_set = set(pending)
+    results["skipped"] = [img for img in images if img not in pending_set]
+
+    print("Found %d images (%d already done, %d to process)" % (len(images), len(results["skipped"]), len(pending)))
+    if not pending:
+        return results
+
+    out_file = open(output, 'a', encoding='utf-8') if jsonl else None
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(extract_palette, img, light_mode, backend, max_pixels) for img in pending]
+        for count, future in enumerate(as_completed(futures), 1):
+            img, wal, error = future.result()
+            if error:
+                print("[%d/%d] Failed %s: %s" % (count, len(pending), img, error))
+                results["failed"].append({"name": img, "error": error})
+                continue
+
+            # Each result is persisted immediately so an interrupted run can resume
+            if jsonl:
+                record = {"image": img, "light_mode": light_mode, "backend": backend, "colors": wal}
+                out_file.write(dumps(record) + '\n')
+                out_file.flush()
+            else:
+                target = _per_image_path(output, root, img)
+                os.makedirs(path.dirname(target), exist_ok=True)
+                # Still a valid colors.json; the extra keys record the settings for resuming
+                record = dict(wal, light_mode=light_mode, backend=backend)
+                with open(target + '.tmp', 'w') as f:
+                    f.write(dumps(record, indent=4))
+                os.replace(target + '.tmp', target)
+
+            print("[%d/%d] Generated %s" % (count, len(pending), img))
+            results["succeeded"].append(img)
+    except KeyboardInterrupt:
+        print("\nInterrupted. Run the same command again to resume.")
+        raise
+    finally:
+        # Don't wait for queued images when stopping early
+        pool.shutdown(wait=True, cancel_futures=True)
+        if out_file:
+            out_file.close()
+
+    return results
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark for single-line @match application.
+
+Times template_parser.match_lines on targets of growing size where every other line
+matches, and prints the time per line. With linear scaling the per-line cost stays flat
+as the target grows; a quadratic implementation grows with the line count.
+
+Usage: python benchmarks/match_scaling.py
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from template_parser import match_lines
+
+
+SIZES = (2_000, 8_000, 32_000, 128_000)
+REPEATS = 5
+
+
+def bench(size):
+    """Best-of-REPEATS seconds to rewrite a CSS-like target with `size` lines"""
+    lines = ['.rule-%d { color: #000000; }' % i if i % 2 else '/* rule %d */' % i for i in range(size)]
+    regex = re.compile(r'color: #')
+    new_lines = ['  color: #1a1b26;', '  background: #c0caf5;']
+
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        match_lines(regex, lines, new_lines)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print("%10s %12s %14s" % ("lines", "total (ms)", "per line (ns)"))
+    per_line = []
+    for size in SIZES:
+        seconds = bench(size)
+        per_line.append(seconds / size)
+        print("%10d %12.2f %14.1f" % (size, seconds * 1000, seconds / size * 1e9))
+
+    # Linear scaling: per-line cost for the largest target within 3x of the smallest
+    ratio = per_line[-1] / per_line[0]
+    print("\nper-line cost ratio (largest/smallest): %.2f -> %s" % (ratio, "linear" if ratio < 3 else "SUPERLINEAR"))
+    return 0 if ratio < 3 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
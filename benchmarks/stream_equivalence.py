@@ -0,0 +1,115 @@
+"""
+Equivalence check for streamed target updates.
+
+Applies every combination of one and two positional templates to targets with CRLF, LF,
+CR and mixed line endings, a UTF-8 BOM, cp850 bytes and late invalid UTF-8, once through
+target_stream and once through the in-memory path, and compares the resulting bytes.
+Chunks are shrunk to a few bytes so separators and multi-byte characters straddle chunk
+boundaries. Targets the stream declines (returns None for) are counted as fallbacks.
+
+Usage: python benchmarks/stream_equivalence.py
+"""
+
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import target_stream
+from template_parser import PrismoTemplate, read_target, write_target
+
+
+TARGETS = {
+    'lf': b'a\nb\nc\n',
+    'crlf': b'a\r\nb\r\nc\r\n',
+    'cr': b'a\rb\rc',
+    'mixed': b'a\r\nb\nc\r\n',
+    'mixed-cr': b'a\nb\rc\n',
+    'no-break': b'abc',
+    'bom': b'\xef\xbb\xbfa\r\nb\r\n\xc3\xa9c',
+    'bom-invalid': b'\xef\xbb\xbfa\nb\n\xffc',
+    'cp850': b'\x82a\nb\nc',
+    'late-invalid': b'a\nb\n' + b'x' * 20 + b'\n\x82\n',
+    'utf8': b'\xc3\xa9a\nb\xe2\x82\xac\nc',
+}
+
+TEMPLATES = {
+    'line': '@line 2\nX {background}',
+    'line-far': '@line 6\nfar',
+    'lines': '@lines 1-2\nY\nZ',
+    'line-multi': '@line 1\nP\nQ',
+    'append': '@append\nEND',
+    'prepend': '@prepend\nSTART',
+    'accent': '@line 3\néè',
+    'euro': '@append\n€',
+}
+
+COLORS = {'background': '#123456'}
+
+
+def in_memory(path, templates):
+    """Bytes produced by the in-memory path"""
+    original, lines, fmt = read_target(path)
+    for template in templates:
+        lines = template.transform(lines, COLORS)
+    write_target(path, original, lines, fmt)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def streamed(path, templates):
+    """Bytes produced by streaming, or None if the stream declined the target"""
+    errors = [None] * len(templates)
+    if target_stream.stream_templates(templates, COLORS, path, errors) is None:
+        return None
+    assert not any(errors), errors
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    try:
+        templates = {}
+        for name, source in TEMPLATES.items():
+            template_path = os.path.join(folder, name + '.prismo')
+            with open(template_path, 'wb') as f:
+                f.write(source.encode('utf-8'))
+            templates[name] = PrismoTemplate(template_path)
+
+        combos = [c for n in (1, 2) for c in itertools.product(templates, repeat=n)]
+        checked = fallbacks = 0
+        mismatches = []
+        for chunk_size in (3, 4, 1024 * 1024):
+            target_stream.CHUNK_SIZE = chunk_size
+            for target_name, data in TARGETS.items():
+                for combo in combos:
+                    chosen = [templates[name] for name in combo]
+                    paths = []
+                    for kind in ('memory', 'stream'):
+                        paths.append(os.path.join(folder, kind + '.txt'))
+                        with open(paths[-1], 'wb') as f:
+                            f.write(data)
+                    expected = in_memory(paths[0], chosen)
+                    actual = streamed(paths[1], chosen)
+                    checked += 1
+                    if actual is None:
+                        fallbacks += 1
+                    elif actual != expected:
+                        mismatches.append((chunk_size, target_name, combo, expected, actual))
+
+        for chunk_size, target_name, combo, expected, actual in mismatches[:10]:
+            print("MISMATCH chunk=%d target=%s templates=%s\n  memory: %r\n  stream: %r"
+                  % (chunk_size, target_name, '+'.join(combo), expected, actual))
+        print("%d cases, %d streamed, %d fell back to memory, %d mismatches"
+              % (checked, checked - fallbacks, fallbacks, len(mismatches)))
+        return 1 if mismatches else 0
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Image Utilities for Prismo
+Image preprocessing shared by the palette extraction backends
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+from PIL import Image
+
+
+# Default pixel budget for the extraction working copy (512x512)
+DEFAULT_MAX_PIXELS = 512 * 512
+
+# Width/height of the difference hash grid (hash_size ** 2 bits)
+DHASH_SIZE = 8
+
+# Width/height of the colour thumbnail compared alongside the dhash
+COLOR_GRID = 8
+
+# Largest mean per-channel difference (0-255) between colour thumbnails of near-identical images.
+# Re-encoding or resizing moves the averages by well under a level; saturation, contrast or
+# colourway edits (which dhash can't see, being grayscale) move them by 6 or more
+COLOR_TOLERANCE = 3
+
+
+@contextmanager
+def working_copy(img, max_pixels=DEFAULT_MAX_PIXELS):
+    """
+    Provide a bounded-size copy of an image for palette extraction.
+
+    Images already within the pixel budget (or with max_pixels <= 0) are used as-is.
+    Larger images are downscaled into a temporary PNG that is removed on exit.
+
+    Args:
+        img (str): Path to the source image
+        max_pixels (int): Maximum number of pixels in the working copy
+
+    Yields:
+        str: Path to the image that should be passed to the backend
+    """
+    if not max_pixels or max_pixels <= 0:
+        yield img
+        return
+
+    with Image.open(img) as im:
+        width, height = im.size
+        if width * height <= max_pixels:
+            resized = None
+        else:
+            scale = (max_pixels / (width * height)) ** 0.5
+            size = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+            # Let JPEG decoders skip straight to a reduced resolution
+            im.draft("RGB", size)
+            resized = im.convert("RGB").resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+    if resized is None:
+        yield img
+        return
+
+    fd, tmp_path = tempfile.mkstemp(prefix="prismo-", suffix=".png")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            resized.save(f, format="PNG", compress_level=1)
+        yield tmp_path
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def dhash(img, hash_size=DHASH_SIZE):
+    """
+    Compute a perceptual difference hash of an image.
+
+    The image is reduced to a small grayscale thumbnail and each bit records whether a
+    pixel is brighter than its right neighbour, so re-encoded or resized copies of the
+    same picture produce hashes that differ in only a few bits.
+
+    Args:
+        img (str): Path to the image
+        hash_size (int): Grid size; the hash has hash_size ** 2 bits
+
+    Returns:
+        str: Hash as a hex string
+    """
+    with Image.open(img) as im:
+        im.draft("L", (hash_size * 8, hash_size * 8))
+        thumb = im.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+        pixels = list(thumb.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return "%0*x" % (hash_size * hash_size // 4, value)
+
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits between two hex hashes"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+def color_signature(img, grid=COLOR_GRID):
+    """
+    Average colours of an image over a coarse grid.
+
+    Complements dhash, which only sees grayscale gradients: copies with adjusted saturation
+    or contrast, or colourways of the same picture, keep their dhash but not these averages.
+
+    Args:
+        img (str): Path to the image
+        grid (int): Grid size; the signature holds grid ** 2 RGB values
+
+    Returns:
+        str: RGB bytes of the grid as a hex string
+    """
+    with Image.open(img) as im:
+        im.draft("RGB", (grid * 8, grid * 8))
+        thumb = im.convert("RGB").resize((grid, grid), Image.Resampling.BOX)
+        return thumb.tobytes().hex()
+
+
+def color_distance(signature_a, signature_b):
+    """Mean per-channel difference (0-255) between two colour signatures"""
+    a, b = bytes.fromhex(signature_a), bytes.fromhex(signature_b)
+    if len(a) != len(b) or not a:
+        return 255
+    return sum(abs(x - y) for x, y in zip(a, b)) / len(a)
@@ -1,14 +1,16 @@
+import sys
+import startup_timer
+if "-ti" in sys.argv or "--timing" in sys.argv:
+    startup_timer.enable()
+
 import argparse
 from colorsys import rgb_to_hls
-from subprocess import Popen, check_output, DEVNULL, PIPE, CalledProcessError
+from subprocess import Popen
 from json import loads, dumps
 import os
 from os import path
-import sys
-import pywal
-import pywal.backends.wal
-import winreg
-from template_parser import apply_template
+# pywal, PIL, winreg and the template parser are imported inside the functions that
+# use them so that light CLI paths (e.g. -t listing, --client) don't pay for them
 from config_manager import (
     load_config, home, data_path, config_path,
     template_path, licenses_path
@@ -20,10 +22,46 @@ config = {}
 # get current Windows wallpaper path
 def get_wallpaper():
     """Get current Windows wallpaper path from registry"""
+    import winreg
     with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Control Panel\Desktop", 0, winreg.KEY_READ) as key:
         value, reg_type = winreg.QueryValueEx(key, "WallPaper")
         return value
 
+# palette extraction backends selectable via config/CLI
+BACKENDS = ("wal", "native")
+
+def get_backend(name):
+    """Return the palette extraction module for a backend name"""
+    if name == "wal":
+        # pywal's ImageMagick extraction using the cached ImageMagick path
+        import wal_backend
+        return wal_backend
+    if name == "native":
+        # Pillow/NumPy backend, imported only when selected
+        import native_backend
+        return native_backend
+    raise ValueError("Unknown backend '%s' (expected one of: %s)" % (name, ", ".join(BACKENDS)))
+
+def extract_palettes(img, backend_name, prescaled=False):
+    """Extract both light and dark palettes from a single decode/quantization pass
+
+    Parameters:
+        img (string): path to the image (or its working copy)
+        backend_name (string): palette extraction backend
+        prescaled (bool): img is a working copy within the pixel budget, so the backend skips its own downscaling
+
+    Returns:
+        dict: {"dark": [16 hex colors], "light": [16 hex colors]}
+    """
+    backend = get_backend(backend_name)
+    raw = backend.gen_colors(img, prescaled)
+    # pywal's ImageMagick output can include the txt header line
+    raw = [c for c in raw if c != "# Image"]
+    return {
+        "dark": backend.adjust(list(raw), False),
+        "light": backend.adjust(list(raw), True)
+    }
+
 # convert path to Linux format for WSL (handles both forward and backslashes)
 convert = lambda i: "/mnt/" + i[0].lower() + i[2:].replace("\\", "/")
 
@@ -42,7 +80,73 @@ class Parser(argparse.ArgumentParser):
         fatal("error: "+message, self)
 
 
-def gen_colors(img, apply_config=True, light_mode=False, templates=None, wsl=None, pywalfox=None, config_dict=None):
+def lint_templates(folder):
+    """
+    Compile every .prismo file in a folder and flag risky @match patterns.
+
+    Args:
+        folder (str): Templates folder
+
+    Returns:
+        int: Number of problems printed
+    """
+    from template_parser import PrismoTemplate
+    from regex_guard import lint_pattern
+
+    print("Linting templates in %s" % folder)
+    problems = 0
+    for template_file in sorted(f for f in os.listdir(folder) if f.endswith('.prismo')):
+        try:
+            template = PrismoTemplate(path.join(folder, template_file))
+        except Exception as e:
+            print("  %s: error: %s" % (template_file, e))
+            problems += 1
+            continue
+
+        warnings = []
+        for op in template.operations:
+            if op.op_type == 'match':
+                pattern = op.params['pattern']
+                for warning in lint_pattern(pattern, op.params.get('multiline', False)):
+                    warnings.append('@match "%s": %s' % (pattern, warning))
+        for warning in warnings:
+            print("  %s: warning: %s" % (template_file, warning))
+        if not warnings:
+            print("  %s: OK" % template_file)
+        problems += len(warnings)
+    return problems
+
+
+def apply_target(jobs, colors, disk_cache=False, state=None, stream_threshold=0, regex_timeout=0, compile_templates=False):
+    """
+    Apply the templates that write to one output file, reading and writing it once.
+
+    Args:
+        jobs (list): (template name, template path, resolved output path) tuples, in config order
+        colors: ColorTable (or color dict) shared by all templates
+        disk_cache (bool): Persist compiled templates on disk
+        state (RunState): Skip the target when nothing it depends on changed since the last run
+        stream_threshold (int): Patch existing targets of at least this many bytes in chunks when possible
+        regex_timeout (float): Seconds each @match may run before its template is reported as failed
+        compile_templates (bool): Render through generated Python functions
+
+    Returns:
+        list: (template name, output path, written, error message or None) per job
+    """
+    from template_parser import apply_templates
+
+    output_resolved = jobs[0][2]
+    try:
+        written, errors = apply_templates([template for _, template, _ in jobs], colors, output_resolved, disk_cache=disk_cache,
+                                         state=state, stream_threshold=stream_threshold, regex_timeout=regex_timeout,
+                                         compile_templates=compile_templates)
+    except Exception as e:
+        # reading or writing the target failed, so none of its templates were applied
+        return [(base_name, output_resolved, False, str(e)) for base_name, _, _ in jobs]
+    return [(base_name, output_resolved, written, error) for (base_name, _, _), error in zip(jobs, errors)]
+
+
+def gen_colors(img, apply_config=True, light_mode=False, templates=None, wsl=None, pywalfox=None, config_dict=None, backend=None):
     """Generates color scheme from image and applies to templates.
 
     Parameters:
@@ -53,21 +157,31 @@ def gen_colors(img, apply_config=True, light_mode=False, templates=None, wsl=Non
         wsl (list or None): list of WSL distros to apply (None = use config, [] = skip with message)
         pywalfox (bool or None): whether to update pywalfox (None = use config, True/False = override)
         config_dict (dict): config dictionary to use (None = use global config)
+        backend (str or None): palette extraction backend, "wal" or "native" (None = use config)
 
     Returns:
         dict: Results with template application status
             {
                 "succeeded": [template_name1, template_name2, ...],
+                "written": [templates whose output file changed],
+                "unchanged": [templates whose output was already up to date (not rewritten)],
                 "failed": [{"name": template_name, "error": error_msg}, ...]
             }
     """
 
+    import pywal
+    from template_parser import ColorTable
+    from palette_cache import PaletteCache, hash_file
+    from image_utils import working_copy, dhash, color_signature, DEFAULT_MAX_PIXELS
+
     # Use provided config or fall back to global config
     active_config = config_dict if config_dict is not None else config
 
     # Track template application results
     results = {
         "succeeded": [],
+        "written": [],
+        "unchanged": [],
         "failed": [],
         "wsl_succeeded": [],
         "wsl_failed": [],
@@ -75,12 +189,39 @@ def gen_colors(img, apply_config=True, light_mode=False, templates=None, wsl=Non
         "pywalfox_attempted": False
     }
 
-    # get/create color scheme
+    backend_name = backend if backend is not None else active_config.get("backend", "wal")
+
+    # get/create color scheme, reusing the cached palettes if this image was seen before
+    cache = PaletteCache(max_entries=active_config.get("cache_size", 64))
+    max_pixels = active_config.get("max_pixels", DEFAULT_MAX_PIXELS)
+    # palettes depend on the working copy size as well as the backend
+    extraction = cache.extraction(backend_name, max_pixels)
+    cache_key = cache.key(hash_file(img), extraction) if cache.enabled else None
+    palettes = cache.get(cache_key) if cache_key else None
+    if palettes is not None:
+        print("Loaded cached pywal colors" + (" (light mode)" if light_mode else ""))
+    else:
+        # fall back to a perceptually near-identical image (re-encoded/resized copies)
+        image_dhash = dhash(img) if cache_key else None
+        image_color = color_signature(img) if cache_key else None
+        similar = cache.find_similar(image_dhash, image_color, extraction,
+                                     active_config.get("phash_distance", 4)) if cache_key else None
+        if similar:
+            # not stored under this image's own key: it was never extracted from this image
+            _, palettes = similar
+            print("Reused cached pywal colors from a similar image" + (" (light mode)" if light_mode else ""))
+        else:
+            # extract from a bounded-size working copy; large wallpapers don't need native resolution
+            with working_copy(img, max_pixels) as work_img:
+                palettes = extract_palettes(work_img, backend_name, prescaled=bool(max_pixels and max_pixels > 0))
+            if cache_key:
+                cache.put(cache_key, palettes, image_dhash, image_color)
+            print("Generated pywal colors" + (" (light mode)" if light_mode else ""))
+    colors = palettes["light" if light_mode else "dark"]
+    startup_timer.mark("palette ready")
+
     wal = pywal.colors.colors_to_dict(
-            pywal.colors.saturate_colors(
-                pywal.backends.wal.get(img, light_mode),
-                ""), img)
-    print("Generated pywal colors" + (" (light mode)" if light_mode else ""))
+            pywal.colors.saturate_colors(colors, ""), img)
 
     # write formatted JSON file
     json_path = home + "\\.cache\\wal\\colors.json"
@@ -122,54 +263,25 @@ def gen_colors(img, apply_config=True, light_mode=False, templates=None, wsl=Non
         else:
             wsl_distros = []
 
-    # Apply to each distro
-    for wsl_distro in wsl_distros:
+    # Apply to all distros concurrently; results are reported in config order
+    if wsl_distros:
+        from wsl_theme import apply_wsl_themes
         try:
-            # First, check if the distro exists
-            check_cmd = f'wsl -d {wsl_distro} -- echo "test"'
-            check_result = Popen(check_cmd, shell=True, stdout=DEVNULL, stderr=PIPE)
-            _, stderr = check_result.communicate()
+            wsl_outcomes = apply_wsl_themes(wsl_distros, convert(img), active_config.get("wsl_executable", "wsl") or "wsl",
+                                          active_config.get("wsl_concurrency", 4))
+        except Exception as e:
+            wsl_outcomes = [(False, str(e))] * len(wsl_distros)
 
-            if check_result.returncode != 0 or b"WSL_E_DISTRO_NOT_FOUND" in stderr:
-                error_msg = f"Distro '{wsl_distro}' not found or not installed"
-                print(f"Skipped WSL '{wsl_distro}' ({error_msg})")
-                results["wsl_failed"].append({"name": wsl_distro, "error": error_msg})
+        for wsl_distro, outcome in zip(wsl_distros, wsl_outcomes):
+            if outcome is None:
+                print(f"Applied WSL wpgtk theme to '{wsl_distro}'")
+                results["wsl_succeeded"].append(wsl_distro)
                 continue
-
-            # Check if wpg is installed
-            wpg_check = f'wsl -d {wsl_distro} -- command -v wpg'
-            wpg_result = Popen(wpg_check, shell=True, stdout=DEVNULL, stderr=DEVNULL)
-            wpg_result.communicate()
-
-            if wpg_result.returncode != 0:
-                error_msg = "wpg (wpgtk) is not installed in this distro"
+            skipped, error_msg = outcome
+            if skipped:
                 print(f"Skipped WSL '{wsl_distro}' ({error_msg})")
-                results["wsl_failed"].append({"name": wsl_distro, "error": error_msg})
-                continue
-
-            # Apply wpgtk theme
-            wsl_img = convert(img)
-            wpg_cmd = f'wsl -d {wsl_distro} -- wpg -s "{wsl_img}"'
-            wpg_process = Popen(wpg_cmd, shell=True, stdout=DEVNULL, stderr=PIPE)
-            _, wpg_stderr = wpg_process.communicate()
-
-            if wpg_process.returncode != 0:
-                error_msg = f"wpg command failed: {wpg_stderr.decode('utf-8', errors='ignore').strip()}"
+            else:
                 print(f"Error applying WSL wpgtk theme to '{wsl_distro}': {error_msg}")
-                results["wsl_failed"].append({"name": wsl_distro, "error": error_msg})
-                continue
-
-            # Clean up old schemes (errors here are non-fatal)
-            img_name = wsl_img.replace("/", "_").replace(" ", "\\ ")
-            cleanup_cmd = f'wsl -d {wsl_distro} -- rm -f ~/.config/wpg/schemes/{img_name[:img_name.rfind(".")]}* 2>/dev/null'
-            Popen(cleanup_cmd, shell=True, stdout=DEVNULL, stderr=DEVNULL).communicate()
-
-            print(f"Applied WSL wpgtk theme to '{wsl_distro}'")
-            results["wsl_succeeded"].append(wsl_distro)
-
-        except Exception as e:
-            error_msg = str(e)
-            print(f"Error applying WSL wpgtk theme to '{wsl_distro}': {error_msg}")
             results["wsl_failed"].append({"name": wsl_distro, "error": error_msg})
 
     # apply templates - merge enabled and disabled for lookup
@@ -177,7 +289,17 @@ def gen_colors(img, apply_config=True, light_mode=False, templates=None, wsl=Non
     all_templates.update(active_config.get("templates", {}))
     all_templates.update(active_config.get("disabled", {}))
 
+    # derived color values are computed once and shared by every template
+    color_table = ColorTable(wal)
+
+    # keep config order so templates sharing an output file are applied predictably
     templates_to_apply = templates if templates is not None else active_config.get("templates", {}).keys()
+    order = {name: i for i, name in enumerate(all_templates)}
+    templates_to_apply = sorted(templates_to_apply, key=lambda name: order.get(name, len(order)))
+
+    # group templates by output file: each file is read and written once, with its templates applied
+    # in config order; different files are processed in parallel
+    groups = {}
     for base_name in templates_to_apply:
         output = all_templates.get(base_name)
         if not output:
@@ -196,17 +318,49 @@ def gen_colors(img, apply_config=True, light_mode=False, templates=None, wsl=Non
             results["failed"].append({"name": base_name, "error": error_msg})
             continue
 
-        # Use new .prismo template parser - continue on failure
-        try:
-            output_resolved = os.path.expandvars(os.path.expanduser(output))
-            apply_template(template, wal, output_resolved)
-            print("Applied %s template to %s" % (base_name, output_resolved))
-            results["succeeded"].append(base_name)
-        except Exception as e:
-            error_msg = str(e)
+        output_resolved = os.path.expandvars(os.path.expanduser(output))
+        target_key = path.normcase(path.abspath(output_resolved))
+        groups.setdefault(target_key, []).append((base_name, template, output_resolved))
+
+    disk_cache = active_config.get("template_disk_cache", False)
+    # remembers what each target was generated from, so untouched targets are skipped entirely
+    state = None
+    if active_config.get("incremental", True):
+        from run_state import RunState
+        state = RunState()
+    stream_threshold = active_config.get("stream_threshold", 8 * 1024 * 1024)
+    regex_timeout = active_config.get("regex_timeout", 10)
+    compile_templates = active_config.get("compile_templates", False)
+    apply_group = lambda jobs: apply_target(jobs, color_table, disk_cache, state, stream_threshold, regex_timeout,
+                                            compile_templates)
+
+    workers = min(max(int(active_config.get("template_workers", 4) or 1), 1), max(len(groups), 1))
+    if workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(apply_group, groups.values()))
+    else:
+        outcomes = [apply_group(jobs) for jobs in groups.values()]
+
+    if state is not None:
+        state.save()
+
+    # report in config order once everything has finished (output from threads would interleave)
+    reports = sorted((o for group in outcomes for o in group), key=lambda o: order.get(o[0], len(order)))
+    for base_name, output_resolved, written, error_msg in reports:
+        if error_msg is not None:
             print("Error applying %s template: %s" % (base_name, error_msg))
             results["failed"].append({"name": base_name, "error": error_msg})
+            continue
+        if written:
+            print("Applied %s template to %s" % (base_name, output_resolved))
+            results["written"].append(base_name)
+        else:
+            print("Skipped %s template (%s is already up to date)" % (base_name, output_resolved))
+            results["unchanged"].append(base_name)
+        results["succeeded"].append(base_name)
 
+    startup_timer.mark("templates applied")
     return results
 
 
@@ -214,12 +368,26 @@ def gen_colors(img, apply_config=True, light_mode=False, templates=None, wsl=Non
 def main(test_args=None, test_config=None, custom_config_path=None):
     """Process flags and read current wallpaper."""
 
+    # thin client: forward the request to a running --serve process when there is one
+    argv = sys.argv[1:] if test_args is None else test_args
+    if "-cl" in argv or "--client" in argv:
+        from server import forward
+        forwarded = [a for a in argv if a not in ("-cl", "--client")]
+        response = forward(forwarded)
+        if response is not None:
+            output, code = response
+            print(output, end="")
+            sys.exit(code)
+        print("No running Prismo server found, running locally...\n")
+        test_args = forwarded
+
     # Load configuration first (initializes data directory if needed)
     global config
     if not test_config:
         config = load_config(custom_config_path=custom_config_path)
     else:
         config = test_config
+    startup_timer.mark("config loaded")
 
     # Launch GUI if no arguments provided (unless --headless is specified)
     if test_args is None and len(sys.argv) == 1:
@@ -232,15 +400,6 @@ def main(test_args=None, test_config=None, custom_config_path=None):
             print(f"Error launching GUI: {e}")
             print("Falling back to CLI mode...\n")
 
-    # check if imagemagick installed to path
-    try:
-        check_output(["where", "magick"])
-    except CalledProcessError:
-        try:
-            check_output(["where", "montage"])
-        except CalledProcessError:
-            fatal("Imagemagick isn't installed to system path. Check README.")
-
     # parse arguments
     parser = Parser()
     parser.description = "Reads current Windows wallpaper, generates pywal color scheme, " \
@@ -251,6 +410,17 @@ def main(test_args=None, test_config=None, custom_config_path=None):
             help="path to custom config folder containing config.yaml and templates/ (default: %%LOCALAPPDATA%%\\Prismo)")
     parser.add_argument("-co", "--colors-only", action="store_true",
             help="generate colors and format JSON only. Takes precedence: ignores all config unless -t, -w, or -p flags are also specified")
+    parser.add_argument("-ba", "--batch", type=str, default=None, metavar="SOURCE",
+            help="generate palettes for every image in a folder or glob pattern in parallel, then exit. "
+                 "Results go to the -o path; images already in the output with the same light mode and backend are skipped "
+                 "so interrupted runs resume")
+    parser.add_argument("-o", "--output", type=str, default="palettes.jsonl",
+            help="batch output: a .jsonl file (one record per image) or a folder (one <image>.json per image, keeping subfolders). "
+                 "Default: palettes.jsonl")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+            help="number of worker processes for --batch (default: CPU count)")
+    parser.add_argument("-wa", "--watch", action="store_true",
+            help="keep running and regenerate colors whenever the wallpaper (or the given filepath) changes")
     parser.add_argument("-lm", "--light-mode", action="store_true",
             help="override config and generate light mode color scheme instead of dark mode")
     parser.add_argument("-t", "--templates", nargs="?", const="__list__", default=None,
@@ -262,12 +432,26 @@ def main(test_args=None, test_config=None, custom_config_path=None):
                  "With 'false': disables WSL regardless of config. "
                  "With distro names: applies to specified distros (ignores wsl_enabled). "
                  "Example: -w, -w true, -w false, -w Ubuntu,Debian")
+    parser.add_argument("-sv", "--serve", action="store_true",
+            help="run a resident background server that keeps config, modules and caches loaded "
+                 "so --client requests skip startup cost")
+    parser.add_argument("-cl", "--client", action="store_true",
+            help="forward this command to a running --serve process (runs locally if none is running)")
+    parser.add_argument("-li", "--lint", action="store_true",
+            help="compile every template in the templates folder, report errors and flag @match patterns "
+                 "prone to catastrophic backtracking, then exit (exit code 1 if anything was found)")
+    parser.add_argument("-ti", "--timing", action="store_true",
+            help="print a startup timing report (module import times and phases) on exit")
+    parser.add_argument("-bk", "--backend", choices=BACKENDS, default=None,
+            help="override config and select the palette extraction backend. "
+                 "'wal' uses ImageMagick via pywal, 'native' uses Pillow/NumPy in-process")
     parser.add_argument("-p", "--pywalfox", nargs="?", const=True, default=None, type=lambda x: x.lower() in ['true', '1', 'yes'],
             help="override config and update pywalfox extension. With no arguments: enables. "
                  "With 'true'/'false' argument: explicitly enable/disable")
     parser.add_argument("filepath", nargs="?", default=None,
             help="optional path to image file (if not provided, uses current wallpaper)")
     args = parser.parse_args(test_args)
+    startup_timer.mark("arguments parsed")
 
     # -co flag takes precedence over other flags (except -h which exits before this)
     # When -co is used alone, it clears other flag overrides
@@ -285,6 +469,12 @@ def main(test_args=None, test_config=None, custom_config_path=None):
         if not test_config:  # Only apply if not in test mode
             config = load_config(custom_config_path=args.config)
 
+    # Resident server mode: handle forwarded --client requests until interrupted
+    if args.serve:
+        from server import serve
+        serve(main, custom_config_path=args.config)
+        sys.exit(0)
+
     # Handle --templates flag without list (print available templates)
     if args.templates == "__list__":
         print("Available templates in config:")
@@ -320,6 +510,12 @@ def main(test_args=None, test_config=None, custom_config_path=None):
         print(f"\nConfig file location: {config_path}")
         sys.exit(0)
 
+    # Check templates without applying them
+    if args.lint:
+        problems = lint_templates(template_path)
+        print("\n%d problem(s) found" % problems if problems else "\nNo problems found")
+        sys.exit(1 if problems else 0)
+
     # Parse WSL distros - support comma-separated list or explicit true/false
     wsl_distros = None
     if args.wsl is not None:
@@ -345,6 +541,34 @@ def main(test_args=None, test_config=None, custom_config_path=None):
     # determine light mode: explicit flag overrides config value
     light_mode = args.light_mode if args.light_mode else config.get("light_mode", False)
 
+    # determine extraction backend: explicit flag overrides config value
+    backend = args.backend if args.backend else config.get("backend", "wal")
+    if backend not in BACKENDS:
+        fatal("Unknown backend in config: %s (expected one of: %s)" % (backend, ", ".join(BACKENDS)))
+
+    # check if imagemagick installed to path (only the wal backend needs it)
+    # the resolved path is cached in the data directory and reused for extraction
+    if backend == "wal":
+        from wal_backend import find_magick
+        if not find_magick():
+            fatal("Imagemagick isn't installed to system path. Check README.\n"
+                  "Alternatively, use the ImageMagick-free backend with '-bk native'.")
+
+    # batch mode: generate palettes for many images and exit without applying templates
+    if args.batch:
+        from batch import run_batch
+        results = run_batch(
+            args.batch,
+            args.output,
+            light_mode=light_mode,
+            backend=backend,
+            max_pixels=config.get("max_pixels"),
+            workers=args.jobs
+        )
+        print("\nBatch complete: %d generated, %d skipped, %d failed" % (
+            len(results["succeeded"]), len(results["skipped"]), len(results["failed"])))
+        sys.exit(1 if results["failed"] else 0)
+
     # use provided filepath or get current wallpaper
     if args.filepath:
         current_wal = args.filepath
@@ -393,13 +617,38 @@ def main(test_args=None, test_config=None, custom_config_path=None):
         # Determine if we should apply config
         apply_config = not args.colors_only or args.templates or args.wsl
 
+        # watch mode: stay resident and regenerate whenever the wallpaper changes
+        if args.watch:
+            from watcher import watch, wallpaper_source, file_source
+            source = file_source(args.filepath) if args.filepath else wallpaper_source()
+            print("Watching %s for changes (Ctrl+C to stop)..." % (args.filepath or "the Windows wallpaper"))
+            try:
+                watch(
+                    source,
+                    lambda img: gen_colors(
+                        img,
+                        apply_config=apply_config,
+                        light_mode=light_mode,
+                        templates=templates_to_apply,
+                        wsl=wsl_distros,
+                        pywalfox=args.pywalfox,
+                        backend=backend
+                    ),
+                    interval=config.get("watch_interval", 2),
+                    debounce=config.get("watch_debounce", 1)
+                )
+            except KeyboardInterrupt:
+                print("\nStopped watching.")
+            exit()
+
         gen_colors(
             current_wal,
             apply_config=apply_config,
             light_mode=light_mode,
             templates=templates_to_apply,
             wsl=wsl_distros,
-            pywalfox=args.pywalfox
+            pywalfox=args.pywalfox,
+            backend=backend
         )
     except Exception as e:
         fatal("Error generating colors from wallpaper: " + str(e) + "\n"
@@ -409,4 +658,14 @@ def main(test_args=None, test_config=None, custom_config_path=None):
     exit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # required for process pools (--batch) in the PyInstaller build
+    if getattr(sys, "frozen", False):
+        from multiprocessing import freeze_support
+        freeze_support()
+    try:
+        main()
+    finally:
+        # stop the @match guard worker if a template started one (main() also runs per
+        # request inside --serve, where the worker is kept warm until the server stops)
+        if "regex_guard" in sys.modules:
+            sys.modules["regex_guard"].shutdown()
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+Native Backend for Prismo
+Extracts pywal-compatible palettes in-process with Pillow and NumPy (no ImageMagick)
+"""
+
+import numpy as np
+from PIL import Image
+import pywal.backends.wal
+
+
+# Number of colors extracted before pywal's light/dark adjustment
+COLOR_COUNT = 16
+
+# Pixels sampled for quantization (pywal's ImageMagick call also works on a reduced image)
+SAMPLE_PIXELS = 64 * 1024
+
+# k-means refinement passes
+ITERATIONS = 12
+
+
+def load_pixels(img, sample_pixels=SAMPLE_PIXELS):
+    """
+    Decode an image into an (N, 3) float array of RGB pixels.
+
+    Args:
+        img (str): Path to the image file
+        sample_pixels (int): Approximate upper bound on the number of pixels returned
+
+    Returns:
+        numpy.ndarray: RGB pixel values in the 0-255 range
+    """
+    with Image.open(img) as im:
+        # Let JPEG decoders skip resolution we are going to throw away anyway
+        scale = max(1.0, (im.width * im.height / sample_pixels) ** 0.5)
+        im.draft("RGB", (int(im.width / scale), int(im.height / scale)))
+        pixels = np.asarray(im.convert("RGB"), dtype=np.float32).reshape(-1, 3)
+
+    # Uniformly subsample what the decoder could not reduce
+    step = max(1, len(pixels) // sample_pixels)
+    return pixels[::step]
+
+
+def quantize(pixels, color_count=COLOR_COUNT, iterations=ITERATIONS):
+    """
+    Reduce pixels to a fixed number of representative colors with vectorized k-means.
+
+    Args:
+        pixels (numpy.ndarray): (N, 3) RGB pixel values
+        color_count (int): Number of colors to produce
+        iterations (int): Number of k-means refinement passes
+
+    Returns:
+        numpy.ndarray: (color_count, 3) cluster centers sorted from darkest to lightest
+    """
+    luminance = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+    # Deterministic seeding: pixels at evenly spaced luminance quantiles
+    order = np.argsort(luminance, kind="stable")
+    seeds = order[np.linspace(0, len(order) - 1, color_count).astype(int)]
+    centers = pixels[seeds].copy()
+
+    pixel_norms = (pixels ** 2).sum(axis=1)[:, None]
+    for _ in range(iterations):
+        # Squared distance from every pixel to every center in one matrix product
+        distances = pixel_norms - 2 * pixels @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+        labels = distances.argmin(axis=1)
+
+        counts = np.bincount(labels, minlength=color_count).astype(np.float32)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, pixels)
+
+        # Empty clusters keep their previous center
+        filled = counts > 0
+        new_centers = centers.copy()
+        new_centers[filled] = sums[filled] / counts[filled, None]
+        if np.allclose(new_centers, centers, atol=0.5):
+            centers = new_centers
+            break
+        centers = new_centers
+
+    center_luminance = centers @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return centers[np.argsort(center_luminance, kind="stable")]
+
+
+def gen_colors(img, prescaled=False):
+    """
+    Generate the raw (unadjusted) color list for an image
+
+    Args:
+        img (str): Path to the image
+        prescaled (bool): Accepted for interface parity with wal_backend; pixels are always
+                          sampled down to SAMPLE_PIXELS, whatever the image size
+    """
+    centers = quantize(load_pixels(img))
+    return ["#%02x%02x%02x" % tuple(int(round(c)) for c in np.clip(center, 0, 255))
+            for center in centers]
+
+
+def adjust(colors, light):
+    """Apply pywal's light/dark adjustment to a raw color list"""
+    return pywal.backends.wal.adjust(colors, light)
+
+
+def get(img, light=False, prescaled=False):
+    """Get colorscheme, matching the interface of pywal's backends"""
+    return adjust(gen_colors(img, prescaled), light)
@@ -0,0 +1,167 @@
+"""
+Palette Cache for Prismo
+Persistent, content-addressed cache of generated color schemes
+"""
+
+import hashlib
+import os
+import time
+from json import loads, dumps
+from os import path
+
+import config_manager
+
+
+# Parsed cache indexes shared by all instances in this process, keyed by index path.
+# Lets a resident process (--serve, --watch) skip re-reading the index until it changes on disk.
+_loaded_indexes = {}
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """
+    Hash the contents of a file.
+
+    Args:
+        file_path (str): Path to the file to hash
+        chunk_size (int): Number of bytes read per chunk
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PaletteCache:
+    """Size-bounded LRU cache of extracted light/dark palettes keyed by image content"""
+
+    def __init__(self, max_entries=64, cache_dir=None):
+        """
+        Args:
+            max_entries (int): Maximum number of palettes kept (0 disables the cache)
+            cache_dir (str): Folder holding the cache index (default: <data_path>/cache)
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir or path.join(config_manager.data_path, "cache")
+        self.index_path = path.join(self.cache_dir, "palettes.json")
+        self._entries = None
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def extraction(backend, max_pixels):
+        """Tag for the extraction settings palettes depend on (backend and working copy size)"""
+        return "%s:%d" % (backend, max_pixels if max_pixels and max_pixels > 0 else 0)
+
+    @staticmethod
+    def key(image_hash, extraction):
+        """Build the cache key for an image hash and extraction tag"""
+        return "%s:%s" % (image_hash, extraction)
+
+    def _load(self):
+        """Read the cache index from disk (once per instance)"""
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = {}
+        if path.isfile(self.index_path):
+            mtime = path.getmtime(self.index_path)
+            loaded = _loaded_indexes.get(self.index_path)
+            if loaded and loaded[0] == mtime:
+                self._entries = loaded[1]
+                return self._entries
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._entries = loads(f.read()).get("entries", {})
+                _loaded_indexes[self.index_path] = (mtime, self._entries)
+            except Exception as e:
+                print(f"Warning: Could not read palette cache, starting fresh: {e}")
+        return self._entries
+
+    def _save(self):
+        """Write the cache index to disk atomically"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(dumps({"entries": self._entries}))
+        os.replace(tmp_path, self.index_path)
+        _loaded_indexes[self.index_path] = (path.getmtime(self.index_path), self._entries)
+
+    def get(self, key):
+        """
+        Look up cached palettes and mark them as recently used.
+
+        Returns:
+            dict or None: Cached {"dark": [...], "light": [...]} palettes, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._load().get(key)
+        if entry is None:
+            return None
+
+        entry["last_used"] = time.time()
+        try:
+            self._save()
+        except Exception as e:
+            print(f"Warning: Could not update palette cache: {e}")
+        return {mode: list(colors) for mode, colors in entry["palettes"].items()}
+
+    def find_similar(self, image_dhash, image_color, extraction, max_distance):
+        """
+        Find palettes of a perceptually near-identical image (e.g. a re-encoded or resized copy).
+
+        Args:
+            image_dhash (str): Perceptual hash of the new image
+            image_color (str): Colour signature of the new image (see image_utils.color_signature)
+            extraction (str): Extraction tag the palettes must come from (see extraction())
+            max_distance (int): Maximum Hamming distance between hashes
+
+        Returns:
+            tuple or None: (key of the matched entry, palettes), or None if nothing is close enough
+        """
+        if not self.enabled or max_distance < 0:
+            return None
+
+        from image_utils import hamming_distance, color_distance, COLOR_TOLERANCE
+
+        best = None
+        for key, entry in self._load().items():
+            if not entry.get("dhash") or not entry.get("color") or not key.endswith(":" + extraction):
+                continue
+            distance = hamming_distance(image_dhash, entry["dhash"])
+            if distance > max_distance or (best is not None and distance >= best[0]):
+                continue
+            # Same structure but different colours (saturation/contrast edits, colourways)
+            if color_distance(image_color, entry["color"]) > COLOR_TOLERANCE:
+                continue
+            best = (distance, key)
+
+        if best is None:
+            return None
+        return best[1], self.get(best[1])
+
+    def put(self, key, palettes, image_dhash=None, image_color=None):
+        """Store both palette variants, evicting the least recently used entries over the limit"""
+        if not self.enabled:
+            return
+
+        entries = self._load()
+        entries[key] = {"palettes": palettes, "dhash": image_dhash, "color": image_color, "last_used": time.time()}
+
+        # Evict least recently used entries beyond the size limit
+        if len(entries) > self.max_entries:
+            by_age = sorted(entries, key=lambda k: entries[k]["last_used"])
+            for old_key in by_age[:len(entries) - self.max_entries]:
+                del entries[old_key]
+
+        try:
+            self._save()
+        except Exception as e:
+            print(f"Warning: Could not write palette cache: {e}")
@@ -0,0 +1,315 @@
+"""
+Regex Guard for Prismo
+Runs templates with @match patterns prone to catastrophic backtracking in a worker process that
+is killed when it exceeds its time budget, and lints patterns for those shapes ahead of time
+"""
+
+import string
+import threading
+import time
+
+try:
+    import re._parser as sre_parse          # Python 3.11+
+    import re._constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+
+# Seconds a new worker may take to start (spawning is slow in the frozen build); not part of
+# a template's time budget
+STARTUP_TIMEOUT = 60
+
+# How often a waiting call checks that its worker is still alive
+POLL_INTERVAL = 0.05
+
+# Started workers not currently running a call; calls check one out so several templates
+# can be guarded at once, and a timeout only kills the worker of the call that caused it
+_idle = []
+_lock = threading.Lock()
+
+
+class _Expired(Exception):
+    """The call ran out of time"""
+
+
+class _WorkerFailed(Exception):
+    """The worker process couldn't be started or died"""
+
+
+def _serve(conn):
+    """Worker process loop: run (func, args) requests until the parent closes the pipe"""
+    conn.send("ready")
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, func(*args)))
+        except Exception as e:
+            conn.send((False, e))
+
+
+class _Worker:
+    """One spawn-context worker process and the pipe to it"""
+
+    def __init__(self):
+        import multiprocessing
+        # spawn: forking a process that is running template threads isn't safe
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.started = False
+
+    def _wait(self, timeout):
+        """
+        Wait for a message from the worker.
+
+        Returns:
+            bool: True if one arrived, False on timeout
+
+        Raises:
+            _WorkerFailed: If the worker process exited instead
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if self.conn.poll(max(0, min(POLL_INTERVAL, remaining))):
+                return True
+            if not self.process.is_alive():
+                raise _WorkerFailed("exited with code %s" % self.process.exitcode)
+            if remaining <= 0:
+                return False
+
+    def _receive(self):
+        """Read the worker's reply, reporting a closed pipe as the worker having exited"""
+        try:
+            return self.conn.recv()
+        except EOFError:
+            self.process.join(1)
+            raise _WorkerFailed("exited with code %s" % self.process.exitcode)
+
+    def call(self, func, args, timeout):
+        """
+        Run func(*args) in the worker
+
+        Returns:
+            tuple: (True, return value) or (False, exception raised by func)
+
+        Raises:
+            _Expired: If the call took longer than timeout
+            _WorkerFailed: If the worker couldn't be started or died
+        """
+        if not self.started:
+            try:
+                if not self._wait(STARTUP_TIMEOUT):
+                    raise _WorkerFailed("did not start within %ds" % STARTUP_TIMEOUT)
+                self._receive()
+            except (_WorkerFailed, OSError) as e:
+                raise _WorkerFailed("The @match guard worker process could not be started (%s); "
+                                    "set regex_timeout to 0 to run patterns without it" % e)
+            self.started = True
+
+        try:
+            self.conn.send((func, args))
+            if not self._wait(timeout):
+                raise _Expired()
+            return self._receive()
+        except (_WorkerFailed, OSError) as e:
+            raise _WorkerFailed("The @match guard worker process stopped unexpectedly (%s)" % e)
+
+    def stop(self):
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+
+def run_guarded(func, args, timeout, patterns):
+    """
+    Call func(*args) in a guard worker process with a hard time limit.
+
+    Workers are started on demand, kept warm between calls and never shared by two calls
+    at once. A worker that can't start is reported as such rather than as a slow pattern.
+
+    Args:
+        func (callable): Module-level function to run
+        args (tuple): Picklable arguments
+        timeout (float): Seconds before the worker is killed
+        patterns (list): Pattern texts the call is guarding, for the error message
+
+    Returns:
+        The function's return value
+
+    Raises:
+        TimeoutError: If the call didn't finish in time
+        RuntimeError: If the worker couldn't be started or died
+    """
+    with _lock:
+        worker = _idle.pop() if _idle else None
+    if worker is None:
+        try:
+            worker = _Worker()
+        except Exception as e:
+            raise RuntimeError("The @match guard worker process could not be started (%s); "
+                               "set regex_timeout to 0 to run patterns without it" % e)
+
+    try:
+        ok, value = worker.call(func, args, timeout)
+    except _Expired:
+        worker.stop()
+        raise TimeoutError("@match pattern %s ran for more than %gs and was stopped "
+                           "(run prismo --lint to check it)"
+                           % (", ".join("'%s'" % p for p in patterns), timeout))
+    except _WorkerFailed as e:
+        worker.stop()
+        raise RuntimeError(str(e))
+    except BaseException:
+        # Interrupted mid-call: the worker may still answer, so it can't be reused
+        worker.stop()
+        raise
+
+    # Completed calls (including ones where func raised) leave the worker ready for the next
+    with _lock:
+        _idle.append(worker)
+    if not ok:
+        raise value
+    return value
+
+
+def shutdown():
+    """Stop the idle guard workers, if any were started"""
+    with _lock:
+        workers = list(_idle)
+        _idle.clear()
+    for worker in workers:
+        worker.stop()
+
+
+def needs_guard(pattern, multiline=False):
+    """Whether a pattern should run time-limited (lint warnings, or a shape the linter can't read)"""
+    try:
+        return bool(lint_pattern(pattern, multiline))
+    except Exception:
+        return True
+
+
+# Characters used to test whether two repeated items can match the same text
+_SAMPLE = string.printable + "\u00e9\u00a0"
+
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: str.isdigit,
+    sre_constants.CATEGORY_NOT_DIGIT: lambda c: not c.isdigit(),
+    sre_constants.CATEGORY_SPACE: str.isspace,
+    sre_constants.CATEGORY_NOT_SPACE: lambda c: not c.isspace(),
+    sre_constants.CATEGORY_WORD: lambda c: c.isalnum() or c == '_',
+    sre_constants.CATEGORY_NOT_WORD: lambda c: not (c.isalnum() or c == '_'),
+}
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+
+
+def _chars(item, dotall):
+    """
+    Sample characters a single-character item can match, or None if the item is
+    more complex (a group, a sequence, ...)
+    """
+    op, av = item
+    if op is sre_constants.LITERAL:
+        return {chr(av)}
+    if op is sre_constants.NOT_LITERAL:
+        return {c for c in _SAMPLE if c != chr(av)}
+    if op is sre_constants.ANY:
+        return set(_SAMPLE) if dotall else {c for c in _SAMPLE if c != '\n'}
+    if op is sre_constants.IN:
+        negate = False
+        matched = set()
+        for set_op, set_av in av:
+            if set_op is sre_constants.NEGATE:
+                negate = True
+            elif set_op is sre_constants.LITERAL:
+                matched.add(chr(set_av))
+            elif set_op is sre_constants.RANGE:
+                matched.update(c for c in _SAMPLE if set_av[0] <= ord(c) <= set_av[1])
+            elif set_op is sre_constants.CATEGORY and set_av in _CATEGORIES:
+                matched.update(c for c in _SAMPLE if _CATEGORIES[set_av](c))
+            else:
+                return None
+        return set(_SAMPLE) - matched if negate else matched
+    return None
+
+
+def _unbounded(item):
+    op, av = item
+    return op in _REPEATS and av[1] == sre_constants.MAXREPEAT
+
+
+def _repeated_chars(item, dotall):
+    """Characters an unbounded repeat of a single-character item consumes, or None"""
+    if not _unbounded(item):
+        return None
+    body = list(item[1][2])
+    return _chars(body[0], dotall) if len(body) == 1 else None
+
+
+def _walk(items, dotall, in_repeat, warnings):
+    """Look for nested unbounded quantifiers and overlapping adjacent ones"""
+    items = list(items)
+    for index, (op, av) in enumerate(items):
+        if op in _REPEATS:
+            unbounded = av[1] == sre_constants.MAXREPEAT
+            if unbounded and in_repeat:
+                warnings.add("nested unbounded quantifiers (e.g. (a+)*) can backtrack exponentially")
+            _walk(av[2], dotall, in_repeat or unbounded, warnings)
+        elif op is sre_constants.SUBPATTERN:
+            _walk(av[-1], dotall, in_repeat, warnings)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                _walk(branch, dotall, in_repeat, warnings)
+            if in_repeat:
+                firsts = [_chars(list(branch)[0], dotall) if len(branch) else None for branch in av[1]]
+                known = [f for f in firsts if f is not None]
+                if len(known) < len(firsts) or any(a & b for i, a in enumerate(known) for b in known[i + 1:]):
+                    warnings.add("alternatives inside a repeated group can match the same text")
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _walk(av[1], dotall, False, warnings)
+        elif getattr(sre_constants, 'ATOMIC_GROUP', None) is op:
+            _walk(av, dotall, False, warnings)
+        elif getattr(sre_constants, 'POSSESSIVE_REPEAT', None) is op:
+            _walk(av[2], dotall, False, warnings)
+
+        # Two adjacent unbounded repeats that can consume the same characters (e.g. \s*\s* or .*.*)
+        if index + 1 < len(items):
+            first = _repeated_chars(items[index], dotall)
+            second = _repeated_chars(items[index + 1], dotall)
+            if first and second and first & second:
+                warnings.add("adjacent unbounded quantifiers can match the same characters")
+
+
+def lint_pattern(pattern, multiline=False):
+    """
+    Check a @match pattern for shapes prone to catastrophic backtracking.
+
+    Args:
+        pattern (str): Regex pattern text
+        multiline (bool): Whether the pattern runs over the whole file (re.DOTALL)
+
+    Returns:
+        list: Human-readable warnings (empty if the pattern looks safe)
+    """
+    flags = sre_constants.SRE_FLAG_DOTALL if multiline else 0
+    tree = sre_parse.parse(pattern, flags)
+    dotall = bool(tree.state.flags & sre_constants.SRE_FLAG_DOTALL)
+
+    warnings = set()
+    _walk(tree, dotall, False, warnings)
+
+    # Over a whole file, an unanchored pattern starting with .* or \s* is retried from every position
+    items = list(tree)
+    if multiline and items and _unbounded(items[0]) and items[0][1][0] == 0:
+        warnings.add("starts with an optional unbounded quantifier, which is retried at every "
+                     "position of the file (quadratic on large files)")
+    return sorted(warnings)
@@ -0,0 +1,105 @@
+"""
+Run State for Prismo
+Remembers what each output file was last generated from, so targets whose templates,
+referenced colors and contents are all unchanged can be skipped on the next run
+"""
+
+import os
+import threading
+from json import loads, dumps
+from os import path
+
+import config_manager
+from palette_cache import hash_file
+
+
+class RunState:
+    """Per-target record of the inputs of the last successful run and the file it produced"""
+
+    def __init__(self, state_dir=None):
+        """
+        Args:
+            state_dir (str): Folder holding the state file (default: <data_path>/cache)
+        """
+        self.state_dir = state_dir or path.join(config_manager.data_path, "cache")
+        self.state_path = path.join(self.state_dir, "run_state.json")
+        self._targets = None
+        self._dirty = False
+        # Shared by the template worker threads; the first lookup loads the file for all of them
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(target):
+        """Normalize a target path so different spellings of one file share an entry"""
+        return path.normcase(path.abspath(target))
+
+    def _load(self):
+        """Read the state file from disk (once per instance, thread-safe)"""
+        if self._targets is not None:
+            return self._targets
+
+        with self._lock:
+            if self._targets is None:
+                # Parsed into a local first, so other threads never see a partially loaded state
+                targets = {}
+                if path.isfile(self.state_path):
+                    try:
+                        with open(self.state_path, 'r', encoding='utf-8') as f:
+                            targets = loads(f.read()).get("targets", {})
+                    except Exception as e:
+                        print(f"Warning: Could not read run state, re-applying all templates: {e}")
+                self._targets = targets
+        return self._targets
+
+    def is_current(self, target, inputs):
+        """
+        Check whether a target was produced from exactly these inputs and hasn't been edited since.
+
+        Args:
+            target (str): Expanded target file path
+            inputs (dict): JSON-compatible description of the templates and color values used
+
+        Returns:
+            bool: True if applying the templates again would be a no-op
+        """
+        entry = self._load().get(self.key(target))
+        if not entry or entry.get("inputs") != inputs:
+            return False
+
+        try:
+            st = os.stat(target)
+        except OSError:
+            return False  # deleted since the last run
+
+        # A matching stat is enough; otherwise fall back to the content hash (e.g. touched or synced)
+        if [st.st_mtime_ns, st.st_size] == entry.get("stat"):
+            return True
+        if st.st_size == entry["stat"][1] and hash_file(target) == entry.get("sha256"):
+            entry["stat"] = [st.st_mtime_ns, st.st_size]
+            self._dirty = True
+            return True
+        return False
+
+    def record(self, target, inputs):
+        """Remember the inputs a target was just generated from, along with its current contents"""
+        st = os.stat(target)
+        self._load()[self.key(target)] = {
+            "inputs": inputs,
+            "stat": [st.st_mtime_ns, st.st_size],
+            "sha256": hash_file(target)
+        }
+        self._dirty = True
+
+    def save(self):
+        """Write the state file atomically if anything changed"""
+        if not self._dirty:
+            return
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(dumps({"targets": self._targets}))
+            os.replace(tmp_path, self.state_path)
+            self._dirty = False
+        except Exception as e:
+            print(f"Warning: Could not write run state: {e}")
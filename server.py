@@ -0,0 +1,152 @@
+"""
+Resident Server for Prismo
+Keeps one warm process with config, modules and caches loaded, and lets thin clients
+forward CLI requests to it over a local named pipe (Windows) or Unix socket
+"""
+
+import getpass
+import io
+import os
+import secrets
+import sys
+import tempfile
+from contextlib import redirect_stdout, redirect_stderr
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from os import path
+
+
+# CLI flags that cannot be forwarded because they would block the server
+BLOCKING_FLAGS = {"-wa", "--watch", "-sv", "--serve"}
+
+
+def _address():
+    """Per-user address of the server endpoint"""
+    user = getpass.getuser()
+    if sys.platform == "win32":
+        return r"\\.\pipe\prismo-" + user
+    return path.join(tempfile.gettempdir(), "prismo-%s.sock" % user)
+
+
+def _key_path():
+    """Per-user file holding the shared authentication key"""
+    return path.join(tempfile.gettempdir(), "prismo-%s.key" % getpass.getuser())
+
+
+def _read_key():
+    with open(_key_path(), "rb") as f:
+        return f.read()
+
+
+def _write_key():
+    """Create a fresh authentication key readable only by the current user"""
+    key = secrets.token_bytes(32)
+    fd = os.open(_key_path(), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def serve(entry_point, custom_config_path=None):
+    """
+    Run the resident server until interrupted.
+
+    Each request is handled by the regular CLI entry point in this process, so module
+    imports, the parsed config and in-memory caches are reused across requests.
+    The config is reloaded automatically when config.yaml changes on disk.
+
+    Args:
+        entry_point (callable): CLI entry point, called as entry_point(test_args=..., test_config=...)
+        custom_config_path (str): Optional custom config folder (same as -c)
+    """
+    import config_manager
+
+    config = config_manager.load_config(custom_config_path=custom_config_path)
+    config_file = config_manager.config_path
+    config_mtime = path.getmtime(config_file) if path.isfile(config_file) else None
+
+    address = _address()
+    if sys.platform != "win32" and path.exists(address):
+        os.remove(address)  # stale socket from a previous run
+
+    listener = Listener(address, authkey=_write_key())
+    print("Prismo server listening on %s (Ctrl+C to stop)" % address)
+
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print(f"Rejected connection: {e}")
+                continue
+
+            with conn:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    continue
+                argv = list(request.get("argv", []))
+
+                # Pick up config edits made since the last request
+                mtime = path.getmtime(config_file) if path.isfile(config_file) else None
+                if mtime != config_mtime:
+                    config = config_manager.load_config(force_reload=True)
+                    config_mtime = mtime
+                    print("Reloaded config: " + config_file)
+
+                print("Request: prismo " + " ".join(argv))
+                conn.send(_handle(entry_point, config, argv, request.get("cwd")))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+    finally:
+        listener.close()
+        # the @match guard worker stays warm across requests; stop it with the server
+        if "regex_guard" in sys.modules:
+            sys.modules["regex_guard"].shutdown()
+        for leftover in (_key_path(), address if sys.platform != "win32" else None):
+            if leftover and path.exists(leftover):
+                os.remove(leftover)
+
+
+def _handle(entry_point, config, argv, cwd):
+    """Run one forwarded CLI request and capture its output and exit code"""
+    if BLOCKING_FLAGS.intersection(argv):
+        return {"output": "error: --watch and --serve cannot be forwarded to the server\n", "code": 2}
+
+    output = io.StringIO()
+    code = 0
+    previous_cwd = os.getcwd()
+    try:
+        if cwd:
+            os.chdir(cwd)
+        with redirect_stdout(output), redirect_stderr(output):
+            entry_point(test_args=argv, test_config=config)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception as e:
+        output.write(f"Error: {e}\n")
+        code = 1
+    finally:
+        os.chdir(previous_cwd)
+    return {"output": output.getvalue(), "code": code}
+
+
+def forward(argv):
+    """
+    Send a CLI request to the resident server.
+
+    Args:
+        argv (list): CLI arguments (without the --client flag)
+
+    Returns:
+        tuple or None: (output, exit code), or None if no server is running
+    """
+    try:
+        conn = Client(_address(), authkey=_read_key())
+    except (OSError, EOFError, AuthenticationError):
+        return None
+
+    with conn:
+        conn.send({"argv": argv, "cwd": os.getcwd()})
+        response = conn.recv()
+    return response["output"], response["code"]
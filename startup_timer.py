@@ -0,0 +1,73 @@
+"""
+Startup Timer for Prismo
+Built-in equivalent of `python -X importtime` plus named phase marks, enabled with --timing
+"""
+
+import atexit
+import builtins
+import sys
+import time
+
+
+# Reference point for all timings (when this module was first imported)
+START = time.perf_counter()
+
+_original_import = builtins.__import__
+_imports = []   # [name, depth, start, seconds] in the order imports started
+_marks = []     # (label, seconds since START)
+_depth = 0
+_enabled = False
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """builtins.__import__ replacement that records the time of first-time imports"""
+    global _depth
+    if level != 0 or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    record = [name, _depth, time.perf_counter(), 0.0]
+    _imports.append(record)
+    _depth += 1
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _depth -= 1
+        record[3] = time.perf_counter() - record[2]
+
+
+def enable():
+    """Start recording imports and print the report when the process exits"""
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    builtins.__import__ = _timed_import
+    atexit.register(report)
+
+
+def mark(label):
+    """Record a named phase (no-op unless timing is enabled)"""
+    if _enabled:
+        _marks.append((label, time.perf_counter() - START))
+
+
+def report(min_ms=1.0):
+    """
+    Print imports slower than min_ms (cumulative, nested imports indented) and phase marks.
+
+    Args:
+        min_ms (float): Hide imports faster than this many milliseconds
+    """
+    builtins.__import__ = _original_import
+    total = time.perf_counter() - START
+
+    print("\nStartup timing report (ms, cumulative):")
+    print("  imports:")
+    for name, depth, _, seconds in _imports:
+        if seconds * 1000 >= min_ms:
+            print("    %8.1f  %s%s" % (seconds * 1000, "  " * depth, name))
+    if _marks:
+        print("  phases:")
+        for label, seconds in _marks:
+            print("    %8.1f  %s" % (seconds * 1000, label))
+    print("  total: %.1f ms" % (total * 1000))
@@ -0,0 +1,498 @@
+"""
+Structured Patches for Prismo
+Backs the @json and @css directives: the target is scanned once to locate the addressed
+node, which is then replaced in place. Comments, formatting and everything else in the
+file are left exactly as they were, and no regex ever runs over the whole document.
+"""
+
+import json
+import re
+import textwrap
+from typing import List, Optional, Tuple
+
+
+# Indentation used when the target gives no hint (e.g. an empty file)
+DEFAULT_INDENT = '    '
+
+# Bare JSON values: numbers, true, false, null
+LITERAL_PATTERN = re.compile(r'-?[0-9][0-9eE.+\-]*|true|false|null')
+
+# Whitespace and // or /* */ comments between tokens
+SKIP_PATTERN = re.compile(r'(?:[ \t\r\n]+|//[^\n]*|/\*.*?\*/)*', re.DOTALL)
+
+# A complete string literal, escapes included
+STRING_PATTERN = re.compile(r'"(?:[^"\\\n]|\\.)*"', re.DOTALL)
+
+# An object key, plus the colon and surrounding whitespace when nothing else is in between
+MEMBER_PATTERN = re.compile(r'"((?:[^"\\\n]|\\.)*)"(?:[ \t\r\n]*(:)[ \t\r\n]*)?')
+
+# Tokens for skimming over a container: runs of plain text, strings, comments, single characters
+SKIM_PATTERN = re.compile(r'[^"{}\[\]/]+|"(?:[^"\\\n]|\\.)*"|//[^\n]*|/\*.*?\*/|.', re.DOTALL)
+
+
+def parse_json_path(spec: str) -> List[tuple]:
+    """
+    Parse an @json path such as schemes[name=Pywal] or "workbench.colorCustomizations".editor
+
+    Steps are separated by dots; keys containing dots can be double-quoted. Each key may be
+    followed by [N] (array index) or [field=value] (first array element whose field equals value).
+
+    Args:
+        spec: Path text from the directive line
+
+    Returns:
+        list: ('key', name), ('index', n) and ('select', field, value) steps
+    """
+    steps = []
+    i = 0
+    spec = spec.strip()
+    while i < len(spec):
+        if spec[i] == '"':
+            end = i + 1
+            while end < len(spec) and spec[end] != '"':
+                end += 2 if spec[end] == '\\' else 1
+            if end >= len(spec):
+                raise ValueError(f"Unterminated quoted key in @json path '{spec}'")
+            steps.append(('key', json.loads(spec[i:end + 1])))
+            i = end + 1
+        elif spec[i] != '[':
+            match = re.match(r'[^.\[\]"]+', spec[i:])
+            if not match:
+                raise ValueError(f"Invalid @json path '{spec}'")
+            steps.append(('key', match.group().strip()))
+            i += match.end()
+
+        while i < len(spec) and spec[i] == '[':
+            end = spec.find(']', i)
+            if end < 0:
+                raise ValueError(f"Unterminated [ in @json path '{spec}'")
+            inner = spec[i + 1:end].strip()
+            if re.fullmatch(r'\d+', inner):
+                steps.append(('index', int(inner)))
+            elif '=' in inner:
+                field, value = inner.split('=', 1)
+                steps.append(('select', field.strip().strip('"\''), value.strip().strip('"\'')))
+            else:
+                raise ValueError(f"Invalid selector [{inner}] in @json path '{spec}'")
+            i = end + 1
+
+        if i < len(spec):
+            if spec[i] != '.':
+                raise ValueError(f"Expected '.' at position {i} in @json path '{spec}'")
+            i += 1
+
+    if not steps:
+        raise ValueError("@json needs a path")
+    return steps
+
+
+class JsonNode:
+    """A value located in the target text: text[start:end]"""
+    __slots__ = ('kind', 'start', 'end', 'members', 'items')
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind        # 'object', 'array', 'string' or 'literal'
+        self.start = start
+        self.end = start
+        self.members = []       # objects: (key, key start, value node)
+        self.items = []         # arrays: value nodes
+
+
+class _JsonScanner:
+    """
+    Single-pass JSONC scanner recording value spans.
+
+    Only containers along the path are broken down into members/items; every other
+    container is skimmed to its closing bracket without building nodes.
+    """
+
+    def __init__(self, text: str, steps: List[tuple]):
+        self.text = text
+        self.steps = steps
+        self.pos = 0
+
+    def error(self, message: str):
+        line = self.text.count('\n', 0, self.pos) + 1
+        column = self.pos - self.text.rfind('\n', 0, self.pos)
+        raise ValueError(f"Invalid JSON in target at line {line}, column {column}: {message}")
+
+    def skip(self):
+        """Skip whitespace and // or /* */ comments"""
+        self.pos = SKIP_PATTERN.match(self.text, self.pos).end()
+        if self.text.startswith('/*', self.pos):
+            self.error("unterminated comment")
+
+    def document(self) -> JsonNode:
+        self.skip()
+        node = self.value(0)
+        self.skip()
+        if self.pos < len(self.text):
+            self.error("unexpected text after the document")
+        return node
+
+    def value(self, depth: Optional[int]) -> JsonNode:
+        """
+        Scan one value. depth is the index of the path step that applies to its children,
+        or None if the value is off the path (containers are then skimmed).
+        """
+        if self.pos >= len(self.text):
+            self.error("unexpected end of file")
+        char = self.text[self.pos]
+        if char in '{[':
+            node = JsonNode('object' if char == '{' else 'array', self.pos)
+            if depth is None:
+                self.skim()
+                node.end = self.pos
+            else:
+                self.container(node, depth)
+            return node
+        if char == '"':
+            node = JsonNode('string', self.pos)
+            self.string()
+            node.end = self.pos
+            return node
+        match = LITERAL_PATTERN.match(self.text, self.pos)
+        if not match:
+            self.error("expected a value")
+        node = JsonNode('literal', self.pos)
+        self.pos = node.end = match.end()
+        return node
+
+    def string(self) -> str:
+        """Scan a string starting at pos and return its decoded value"""
+        match = STRING_PATTERN.match(self.text, self.pos)
+        if not match:
+            self.error("unterminated string")
+        self.pos = match.end()
+        raw = match.group()
+        return json.loads(raw) if '\\' in raw else raw[1:-1]
+
+    def skim(self):
+        """Move past a container by bracket counting (strings and comments can't close it)"""
+        depth = 0
+        for match in SKIM_PATTERN.finditer(self.text, self.pos):
+            char = match.group()[0]
+            if char in '{[':
+                depth += 1
+            elif char in '}]':
+                depth -= 1
+                if depth == 0:
+                    self.pos = match.end()
+                    return
+        self.pos = len(self.text)
+        self.error("unexpected end of file")
+
+    def _child_depth(self, depth: int, key=None, index=None) -> Optional[int]:
+        """Step index for a child's own children, or None if the child is off the path"""
+        if depth >= len(self.steps):
+            return None
+        step = self.steps[depth]
+        if key is not None:
+            on_path = step == ('key', key)
+        else:
+            on_path = step[0] == 'select' or step == ('index', index)
+        return depth + 1 if on_path else None
+
+    def container(self, node: JsonNode, depth: int):
+        text = self.text
+        closer = '}' if node.kind == 'object' else ']'
+        skip = SKIP_PATTERN.match
+        self.pos += 1
+        while True:
+            self.skip()
+            if text.startswith(closer, self.pos):
+                self.pos += 1
+                node.end = self.pos
+                return
+
+            if node.kind == 'object':
+                # Key and colon in one match for the common case (no comments in between)
+                member = MEMBER_PATTERN.match(text, self.pos)
+                if not member:
+                    self.error("expected a key")
+                key_start = self.pos
+                key = member.group(1)
+                if '\\' in key:
+                    key = json.loads('"%s"' % key)
+                self.pos = member.end()
+                if member.group(2) is None:
+                    self.skip()
+                    if not text.startswith(':', self.pos):
+                        self.error("expected ':'")
+                    self.pos += 1
+                    self.skip()
+                node.members.append((key, key_start, self.value(self._child_depth(depth, key=key))))
+            else:
+                node.items.append(self.value(self._child_depth(depth, index=len(node.items))))
+
+            self.pos = skip(text, self.pos).end()
+            if text.startswith(',', self.pos):
+                self.pos += 1
+            elif not text.startswith(closer, self.pos):
+                self.error(f"expected ',' or '{closer}'")
+
+
+def _line_indent(text: str, pos: int) -> str:
+    """Leading whitespace of the line containing pos"""
+    start = text.rfind('\n', 0, pos) + 1
+    end = start
+    while end < len(text) and text[end] in ' \t':
+        end += 1
+    return text[start:end]
+
+
+def _indent_unit(text: str) -> str:
+    """Indentation step used by the file (first indented line), or the default"""
+    match = re.search(r'\n([ \t]+)\S', text)
+    return match.group(1) if match else DEFAULT_INDENT
+
+
+def _block(content: str, indent: str) -> str:
+    """Dedent content and indent every line after the first (the first continues the current line)"""
+    lines = textwrap.dedent(content).strip('\n').split('\n')
+    return '\n'.join([lines[0]] + [indent + line if line else line for line in lines[1:]])
+
+
+def _same_line(text: str, a: int, b: int) -> bool:
+    return '\n' not in text[a:b]
+
+
+def _splice(text: str, start: int, end: int, new: str) -> str:
+    return text[:start] + new + text[end:]
+
+
+def _remove(text: str, parent: JsonNode, index: int) -> str:
+    """Remove an array item or object member together with its separating comma"""
+    if parent.kind == 'object':
+        spans = [(key_start, value.end) for _, key_start, value in parent.members]
+    else:
+        spans = [(item.start, item.end) for item in parent.items]
+
+    if len(spans) == 1:
+        return _splice(text, parent.start + 1, parent.end - 1, '')
+    if index > 0:
+        return _splice(text, spans[index - 1][1], spans[index][1], '')
+    return _splice(text, spans[0][0], spans[1][0], '')
+
+
+def _insert(text: str, parent: JsonNode, entry: str, at_start: bool) -> str:
+    """Insert an array item or "key": value member, matching the surrounding layout"""
+    children = [key_start for _, key_start, _ in parent.members] if parent.kind == 'object' \
+        else [item.start for item in parent.items]
+    ends = [value.end for _, _, value in parent.members] if parent.kind == 'object' \
+        else [item.end for item in parent.items]
+
+    if not children:
+        outer = _line_indent(text, parent.start)
+        inner = outer + _indent_unit(text)
+        return _splice(text, parent.start + 1, parent.end - 1, '\n' + inner + _block(entry, inner) + '\n' + outer)
+
+    inline = _same_line(text, parent.start, children[0])
+    if at_start:
+        indent = _line_indent(text, children[0])
+        separator = ', ' if inline else ',\n' + indent
+        return _splice(text, children[0], children[0], _block(entry, indent) + separator)
+
+    indent = _line_indent(text, children[-1])
+    separator = ', ' if inline else ',\n' + indent
+    return _splice(text, ends[-1], ends[-1], separator + _block(entry, indent))
+
+
+def _matches(text: str, item: JsonNode, field: str, value: str) -> bool:
+    """Whether an array item is an object whose field equals value"""
+    if item.kind != 'object':
+        return False
+    for key, _, member in item.members:
+        if key == field and member.kind in ('string', 'literal'):
+            return str(json.loads(text[member.start:member.end])) == value
+    return False
+
+
+def _resolve(text: str, steps: List[tuple]) -> Tuple[str, Optional[JsonNode], Optional[JsonNode]]:
+    """
+    Walk to the parent of the last step, creating missing object members on the way.
+
+    Returns:
+        tuple: (possibly edited text, parent node, root node)
+    """
+    while True:
+        root = _JsonScanner(text, steps).document()
+        node = root
+        for position, step in enumerate(steps[:-1]):
+            following = steps[position + 1]
+            if step[0] == 'key':
+                if node.kind != 'object':
+                    raise ValueError(f"@json: '{step[1]}' is not inside an object")
+                child = next((value for key, _, value in node.members if key == step[1]), None)
+                if child is None:
+                    # Create the missing member, then scan again
+                    empty = '{}' if following[0] == 'key' else '[]'
+                    text = _insert(text, node, json.dumps(step[1]) + ': ' + empty, at_start=False)
+                    break
+                node = child
+            elif step[0] == 'index':
+                if node.kind != 'array' or step[1] >= len(node.items):
+                    raise ValueError(f"@json: index [{step[1]}] not found")
+                node = node.items[step[1]]
+            else:
+                if node.kind != 'array':
+                    raise ValueError(f"@json: [{step[1]}={step[2]}] is not inside an array")
+                node = next((item for item in node.items if _matches(text, item, step[1], step[2])), None)
+                if node is None:
+                    raise ValueError(f"@json: no element matches [{step[1]}={step[2]}]")
+        else:
+            return text, node, root
+
+
+def patch_json(text: str, steps: List[tuple], content: str) -> str:
+    """
+    Replace, insert or (with empty content) remove the JSON node addressed by a path
+
+    [field=value] selectors update the first matching element, drop any duplicates and
+    insert the node at the start of the array if there is no match.
+
+    Args:
+        text: Current target text ('\\n' newlines); an empty target starts as {}
+        steps: Parsed path from parse_json_path
+        content: Replacement JSON text (already color-substituted)
+
+    Returns:
+        str: The patched text
+    """
+    if not text.strip():
+        text = '{}'
+    content = content.strip('\n')
+    last = steps[-1]
+
+    while True:
+        text, parent, _ = _resolve(text, steps)
+
+        if last[0] == 'key':
+            if parent.kind != 'object':
+                raise ValueError(f"@json: '{last[1]}' is not inside an object")
+            index = next((i for i, (key, _, _) in enumerate(parent.members) if key == last[1]), None)
+            if index is None:
+                if content:
+                    text = _insert(text, parent, json.dumps(last[1]) + ': ' + content, at_start=False)
+                return text
+            if not content:
+                return _remove(text, parent, index)
+            value = parent.members[index][2]
+            return _splice(text, value.start, value.end, _block(content, _line_indent(text, value.start)))
+
+        if parent.kind != 'array':
+            raise ValueError(f"@json: {steps[-1]} is not inside an array")
+
+        if last[0] == 'index':
+            if last[1] >= len(parent.items):
+                raise ValueError(f"@json: index [{last[1]}] not found")
+            if not content:
+                return _remove(text, parent, last[1])
+            item = parent.items[last[1]]
+            return _splice(text, item.start, item.end, _block(content, _line_indent(text, item.start)))
+
+        matches = [i for i, item in enumerate(parent.items) if _matches(text, item, last[1], last[2])]
+        # Drop duplicates one at a time (rescanning keeps the spans valid)
+        if len(matches) > (1 if content else 0):
+            text = _remove(text, parent, matches[-1])
+            continue
+        if not content:
+            return text
+        if not matches:
+            return _insert(text, parent, content, at_start=True)
+        item = parent.items[matches[0]]
+        return _splice(text, item.start, item.end, _block(content, _line_indent(text, item.start)))
+
+
+def _css_rules(text: str) -> List[Tuple[str, int, int, int]]:
+    """
+    Find top-level CSS rules in one pass, skipping comments and strings.
+
+    Returns:
+        list: (normalized selector, selector start, '{' position, matching '}' position)
+    """
+    rules = []
+    depth = 0
+    selector_start = 0
+    open_pos = 0
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            if end < 0:
+                raise ValueError("Invalid CSS in target: unterminated comment")
+            # A comment before a selector belongs to the surrounding text, not the rule
+            if depth == 0 and not text[selector_start:i].strip():
+                selector_start = end + 2
+            i = end + 2
+            continue
+        if char in '"\'':
+            end = i + 1
+            while end < len(text) and text[end] != char:
+                end += 2 if text[end] == '\\' else 1
+            i = end + 1
+            continue
+        if char == '{':
+            if depth == 0:
+                open_pos = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth < 0:
+                raise ValueError("Invalid CSS in target: unbalanced '}'")
+            if depth == 0:
+                selector = _strip_css_comments(text[selector_start:open_pos])
+                start = selector_start + len(text[selector_start:open_pos]) - len(text[selector_start:open_pos].lstrip())
+                rules.append((' '.join(selector.split()), start, open_pos, i))
+                selector_start = i + 1
+        elif char == ';' and depth == 0:
+            selector_start = i + 1
+        i += 1
+    return rules
+
+
+def _strip_css_comments(text: str) -> str:
+    return re.sub(r'/\*.*?\*/', ' ', text, flags=re.DOTALL)
+
+
+def patch_css(text: str, selector: str, content: str) -> str:
+    """
+    Replace the declarations of every top-level rule with the given selector, append the rule
+    if it doesn't exist, or (with empty content) remove it
+
+    Args:
+        text: Current target text ('\\n' newlines)
+        selector: Rule selector, compared with whitespace normalized
+        content: Declarations for the rule body (already color-substituted)
+
+    Returns:
+        str: The patched text
+    """
+    wanted = ' '.join(selector.split())
+    content = content.strip('\n')
+    matches = [rule for rule in _css_rules(text) if rule[0] == wanted]
+
+    if not matches:
+        if not content:
+            return text
+        unit = _indent_unit(text)
+        rule = wanted + ' {\n' + unit + _block(content, unit) + '\n}\n'
+        if not text.strip():
+            return rule
+        return text.rstrip('\n') + '\n\n' + rule
+
+    # Edit from the end so earlier offsets stay valid
+    for _, start, open_pos, close_pos in reversed(matches):
+        if not content:
+            end = close_pos + 1
+            if text.startswith('\n', end):
+                end += 1
+            text = _splice(text, start, end, '')
+            continue
+        outer = _line_indent(text, start)
+        body = text[open_pos + 1:close_pos]
+        inner = re.search(r'\n([ \t]+)\S', body)
+        inner = inner.group(1) if inner else outer + _indent_unit(text)
+        text = _splice(text, open_pos + 1, close_pos, '\n' + inner + _block(content, inner) + '\n' + outer)
+    return text
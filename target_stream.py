@@ -0,0 +1,291 @@
+"""
+Streaming Target Updates for Prismo
+Applies positional directives (@line, @lines, @append, @prepend) to large targets in constant
+memory: untouched parts of the file are copied in chunks and only the affected region is rebuilt
+"""
+
+import codecs
+import os
+import shutil
+
+from template_parser import TargetFormat, BOMS, temp_beside, replace_file
+
+
+# Bytes read per chunk when copying or scanning a target
+CHUNK_SIZE = 1024 * 1024
+
+# Directives that only need line positions, never the file's text
+STREAM_OPS = {'line', 'lines', 'append', 'prepend'}
+
+
+def can_stream(templates) -> bool:
+    """Whether every operation of the (loaded) templates can be applied without materializing the file"""
+    return all(op.op_type in STREAM_OPS for template in templates if template for op in template.operations)
+
+
+def detect_format(target: str):
+    """
+    Detect a target's encoding, BOM and newline style, scanning it once in chunks
+
+    The in-memory path decodes the whole file and normalizes every line break, so the file
+    can only be streamed when byte-wise splitting on one separator gives the same result.
+
+    Returns:
+        TargetFormat or None: None if the file must be handled in memory (UTF-16, mixed line
+                              endings, or invalid UTF-8 after a UTF-8 BOM)
+    """
+    with open(target, 'rb') as f:
+        chunk = f.read(CHUNK_SIZE)
+        bom = b''
+        for mark, codec in BOMS:
+            if chunk.startswith(mark):
+                if codec != 'utf-8':
+                    return None
+                bom = mark
+                chunk = chunk[len(mark):] or f.read(CHUNK_SIZE)
+                break
+
+        # Like decode_target: UTF-8 unless any byte is invalid, then cp850 (which maps every byte)
+        encoding = 'utf-8'
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        cr = lf = crlf = 0
+        first = None  # first line break: b'\r\n', b'\n' or None (only bare \r, or no break at all)
+        previous = b''
+        while chunk:
+            if decoder is not None:
+                try:
+                    decoder.decode(chunk)
+                except UnicodeDecodeError:
+                    if bom:
+                        return None  # decoded with replacement characters in memory
+                    encoding, decoder = 'cp850', None
+            # Line breaks are the same bytes in both encodings (and never part of a UTF-8 sequence)
+            cr += chunk.count(b'\r')
+            lf += chunk.count(b'\n')
+            crlf += chunk.count(b'\r\n') + (previous == b'\r' and chunk[:1] == b'\n')
+            if first is None and lf:
+                i = chunk.find(b'\n')
+                first = b'\r\n' if (chunk[i - 1:i] if i else previous) == b'\r' else b'\n'
+            previous = chunk[-1:]
+            chunk = f.read(CHUNK_SIZE)
+        if decoder is not None:
+            try:
+                decoder.decode(b'', final=True)
+            except UnicodeDecodeError:
+                if bom:
+                    return None
+                encoding = 'cp850'
+
+    # The first line break decides the style; any other kind of break can't be split byte-wise
+    if first == b'\r\n':
+        if not cr == lf == crlf:
+            return None
+        newline = '\r\n'
+    elif first == b'\n':
+        if cr:
+            return None
+        newline = '\n'
+    else:
+        newline = '\r' if cr else os.linesep
+    return TargetFormat(encoding, bom, newline)
+
+
+class _LineReader:
+    """Chunked reader that copies or skips a target up to a given number of line separators"""
+
+    def __init__(self, f, sep: bytes):
+        self.f = f
+        self.sep = sep
+        self.buf = b''
+
+    def copy_lines(self, count: int, out=None) -> int:
+        """
+        Copy (or skip, when out is None) everything up to and including the count-th separator
+
+        Returns:
+            int: Separators found (less than count if the file ended first)
+        """
+        sep = self.sep
+        buf = self.buf
+        found = 0
+        scan = 0
+        while found < count:
+            i = buf.find(sep, scan)
+            if i >= 0:
+                scan = i + len(sep)
+                found += 1
+                continue
+            # Flush what was scanned, keeping a tail that could be the start of a split separator
+            cut = max(scan, len(buf) - (len(sep) - 1))
+            if out is not None:
+                out.write(buf[:cut])
+            buf = buf[cut:]
+            scan = 0
+            chunk = self.f.read(CHUNK_SIZE)
+            if not chunk:
+                scan = len(buf)
+                break
+            buf += chunk
+
+        if out is not None:
+            out.write(buf[:scan])
+        self.buf = buf[scan:]
+        return found
+
+    def copy_rest(self, out):
+        """Copy everything that hasn't been read yet"""
+        out.write(self.buf)
+        self.buf = b''
+        shutil.copyfileobj(self.f, out, CHUNK_SIZE)
+
+
+def _validate(op):
+    """Raise the same errors PrismoTemplate.transform would for invalid line numbers"""
+    if op.op_type == 'line' and op.params['line_num'] < 1:
+        raise ValueError(f"Line number must be >= 1, got {op.params['line_num']}")
+    if op.op_type == 'lines':
+        start, end = op.params['start'], op.params['end']
+        if start < 1 or end < 1:
+            raise ValueError(f"Line numbers must be >= 1, got start={start}, end={end}")
+        if start > end:
+            raise ValueError(f"Start line ({start}) must be <= end line ({end})")
+
+
+def _apply_pass(src_path: str, out, op, content: bytes, fmt: TargetFormat):
+    """
+    Copy src_path to out with one positional operation applied.
+
+    Produces the same bytes as splitting the decoded file on newlines, applying the
+    operation to the list of lines and joining it again.
+    """
+    sep = fmt.newline.encode(fmt.encoding)
+    with open(src_path, 'rb') as f:
+        f.seek(len(fmt.bom))
+        out.write(fmt.bom)
+        reader = _LineReader(f, sep)
+
+        if op.op_type == 'prepend':
+            out.write(content + sep)
+            reader.copy_rest(out)
+            return
+
+        if op.op_type == 'append':
+            reader.copy_rest(out)
+            out.write(sep + content)
+            return
+
+        if op.op_type == 'line':
+            start = end = op.params['line_num']
+        else:
+            start, end = op.params['start'], op.params['end']
+
+        # Lines before the range, padding with empty lines if the file is too short
+        copied = reader.copy_lines(start - 1, out)
+        if copied < start - 1:
+            out.write(sep * (start - 1 - copied))
+            out.write(content)
+            return
+
+        out.write(content)
+        # Drop the replaced lines; whatever follows the range is kept as-is
+        if reader.copy_lines(end - start + 1) == end - start + 1:
+            out.write(sep)
+            reader.copy_rest(out)
+
+
+def _spans_lines(content: bytes, fmt: TargetFormat) -> bool:
+    """Whether encoded content spans several lines"""
+    return fmt.newline.encode(fmt.encoding) in content
+
+
+def same_contents(path_a: str, path_b: str) -> bool:
+    """Compare two files chunk by chunk (sizes first)"""
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, 'rb') as a, open(path_b, 'rb') as b:
+        while True:
+            chunk_a = a.read(CHUNK_SIZE)
+            if chunk_a != b.read(CHUNK_SIZE):
+                return False
+            if not chunk_a:
+                return True
+
+
+def stream_templates(templates, colors, target: str, errors: list):
+    """
+    Apply positional-only templates to an existing target without loading it into memory.
+
+    Args:
+        templates: Loaded templates in order (None for ones that failed to load)
+        colors: ColorTable (or color dict) to render from
+        target: Expanded path of an existing target file
+        errors: Per-template error messages, updated in place for templates that fail
+
+    Returns:
+        bool or None: True if written, False if unchanged, None if the target can't be streamed
+    """
+    # Write through symlinks (e.g. configs kept in a dotfiles repo) instead of replacing the link
+    target = os.path.realpath(target)
+    fmt = detect_format(target)
+    if fmt is None:
+        return None
+
+    # Render and encode everything up front so a failing template is skipped as a whole
+    passes = []
+    for i, template in enumerate(templates):
+        if template is None:
+            continue
+        try:
+            encoded = []
+            for op, content in template.rendered(colors):
+                _validate(op)
+                encoded.append((op, content.replace('\n', fmt.newline).encode(fmt.encoding)))
+            passes.extend(encoded)
+        except UnicodeEncodeError:
+            return None  # content the file's code page can't hold: let the in-memory path convert it
+        except Exception as e:
+            errors[i] = str(e)
+
+    if not passes:
+        return False
+
+    # In memory, multi-line content placed by @line/@lines stays one entry of the line list, so
+    # later @line/@lines numbers skip over it; streaming counts physical lines, so defer to memory
+    multiline_entry = False
+    for op, content in passes:
+        if op.op_type in ('line', 'lines'):
+            if multiline_entry:
+                return None
+            multiline_entry = _spans_lines(content, fmt)
+
+    # Appending only: extend the file in place instead of copying it
+    if all(op.op_type == 'append' for op, _ in passes):
+        sep = fmt.newline.encode(fmt.encoding)
+        with open(target, 'ab') as f:
+            for _, content in passes:
+                f.write(sep + content)
+        return True
+
+    # One chunked copy per operation, each reading the previous pass's output
+    src_path = target
+    try:
+        for op, content in passes:
+            fd, tmp_path = temp_beside(target)
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    _apply_pass(src_path, out, op, content, fmt)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            finally:
+                if src_path != target:
+                    os.remove(src_path)
+            src_path = tmp_path
+
+        if same_contents(src_path, target):
+            return False
+        replace_file(src_path, target)
+        return True
+    finally:
+        if src_path != target and os.path.exists(src_path):
+            os.remove(src_path)
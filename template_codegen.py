@@ -0,0 +1,104 @@
+"""
+Template Code Generation for Prismo
+Compiles a parsed template's content blocks into one generated Python function, so rendering
+it against a palette is a single call that joins pre-merged literals with inlined lookups
+"""
+
+import importlib.util
+import marshal
+import os
+
+from template_parser import DISK_CACHE_DIR, CACHE_VERSION, placeholder_text
+
+
+# Bytecode is only valid for the interpreter that produced it
+HEADER = importlib.util.MAGIC_NUMBER + CACHE_VERSION.to_bytes(4, 'little')
+
+
+def generate_source(template) -> str:
+    """
+    Generate the source of a render(values) function for a template.
+
+    The function returns a tuple with the rendered content of every operation, in order.
+    Literal text is embedded as constants and each placeholder becomes one dict lookup
+    (unknown colors/components fall back to the placeholder text, like the interpreter).
+
+    Args:
+        template: Parsed PrismoTemplate
+
+    Returns:
+        str: Python source defining render(values)
+    """
+    lines = ["def render(values):", "    get = values.get", "    return ("]
+    for op in template.operations:
+        parts = []
+        for seg in op.segments:
+            if seg.__class__ is str:
+                parts.append(repr(seg))
+            else:
+                parts.append("(get(%r) or %r)" % (seg, placeholder_text(seg)))
+        if not parts:
+            expression = "''"
+        elif len(parts) == 1 and parts[0][0] != '(':
+            expression = parts[0]
+        else:
+            expression = "''.join((%s,))" % ", ".join(parts)
+        lines.append("        %s," % expression)
+    lines.append("    )")
+    return "\n".join(lines) + "\n"
+
+
+def _code_path(template_path: str) -> str:
+    """Location of the cached bytecode for a template"""
+    folder, name = os.path.split(template_path)
+    return os.path.join(folder, DISK_CACHE_DIR, name + '.code')
+
+
+def _load_code(template_path: str, source_hash: str):
+    """Load cached bytecode built from the same template source by this interpreter"""
+    code_path = _code_path(template_path)
+    if not os.path.isfile(code_path):
+        return None
+    try:
+        with open(code_path, 'rb') as f:
+            data = f.read()
+        prefix = HEADER + source_hash.encode('ascii')
+        if data.startswith(prefix):
+            return marshal.loads(data[len(prefix):])
+    except Exception:
+        pass
+    return None
+
+
+def _save_code(template_path: str, source_hash: str, code):
+    """Write bytecode next to the template (failures are non-fatal)"""
+    code_path = _code_path(template_path)
+    try:
+        os.makedirs(os.path.dirname(code_path), exist_ok=True)
+        with open(code_path + '.tmp', 'wb') as f:
+            f.write(HEADER + source_hash.encode('ascii') + marshal.dumps(code))
+        os.replace(code_path + '.tmp', code_path)
+    except Exception as e:
+        print(f"Warning: Could not write compiled template for {template_path}: {e}")
+
+
+def compile_template(template, disk_cache: bool = False):
+    """
+    Build the generated render function for a template.
+
+    Args:
+        template: Parsed PrismoTemplate
+        disk_cache: Reuse/store the bytecode in the __prismocache__ folder next to the template
+
+    Returns:
+        callable: render(values) -> tuple of rendered contents, one per operation
+    """
+    code = _load_code(template.template_path, template.source_hash) if disk_cache else None
+    if code is None:
+        code = compile(generate_source(template), '<prismo %s>' % os.path.basename(template.template_path), 'exec')
+        if disk_cache:
+            _save_code(template.template_path, template.source_hash, code)
+
+    namespace = {}
+    exec(code, namespace)
+    return namespace['render']
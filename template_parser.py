@@ -5,30 +5,101 @@ Parses .prismo template files and applies them to target files
 
 import re
 import os
-from typing import Dict, List, Tuple, Optional
+import codecs
+import io
+import hashlib
+import pickle
+import shutil
+import tempfile
+from typing import Dict, List, NamedTuple, Tuple, Optional
 from colorsys import rgb_to_hls
 
+from structured_patch import parse_json_path, patch_json, patch_css
+
+
+# Matches {name} and {name.component} color placeholders
+PLACEHOLDER_PATTERN = re.compile(r'\{([A-Za-z0-9_]+)(?:\.([A-Za-z0-9_]+))?\}')
+
+# Bump when the compiled representation changes so stale on-disk caches are ignored
+CACHE_VERSION = 6
+
+# Folder (next to the templates) holding on-disk compiled template caches
+DISK_CACHE_DIR = '__prismocache__'
+
+# Process umask, read once at import (reading it means setting it, which isn't thread-safe)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Compiled templates kept in memory: absolute path -> ((mtime_ns, size), source hash, template)
+_template_cache: Dict[str, Tuple[Tuple[int, int], str, 'PrismoTemplate']] = {}
+
 
 class TemplateOperation:
     """Represents a single template operation"""
     def __init__(self, op_type: str, content: str, **kwargs):
-        self.op_type = op_type  # 'line', 'lines', 'match', 'append', 'prepend'
+        self.op_type = op_type  # 'full', 'line', 'lines', 'match', 'append', 'prepend', 'json', 'css'
         self.content = content
         self.params = kwargs
+        # Content split once into literal strings and (name, component) placeholders
+        self.segments = tokenize(content)
+        # (name, component) pairs referenced by the content
+        self.placeholders = {seg for seg in self.segments if isinstance(seg, tuple)}
+        # Pre-compiled @match pattern
+        self.regex = None
+
+
+def tokenize(content: str) -> list:
+    """
+    Split content into literal text and placeholders in a single pass.
+
+    Returns:
+        list: str items for literal text and (name, component) tuples for placeholders,
+              where component is None for a plain {name}
+    """
+    segments = []
+    pos = 0
+    for match in PLACEHOLDER_PATTERN.finditer(content):
+        if match.start() > pos:
+            segments.append(content[pos:match.start()])
+        segments.append((match.group(1), match.group(2)))
+        pos = match.end()
+    if pos < len(content):
+        segments.append(content[pos:])
+    return segments
 
 
 class PrismoTemplate:
     """Parses and applies .prismo template files"""
 
-    def __init__(self, template_path: str):
+    def __init__(self, template_path: str, source: Optional[bytes] = None):
+        """
+        Args:
+            template_path: Path to the .prismo file
+            source: Raw file contents, if already read (avoids a second read)
+        """
         self.template_path = template_path
+        if source is None:
+            with open(template_path, 'rb') as f:
+                source = f.read()
+        self.source_hash = hashlib.sha256(source).hexdigest()
         self.operations: List[TemplateOperation] = []
-        self._parse()
-
-    def _parse(self):
-        """Parse the .prismo template file"""
-        with open(self.template_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        self._parse(source.decode('utf-8'))
+        self._compile()
+        # Every (name, component) the template reads, so callers can tell which color changes affect it
+        self.references = set().union(*(op.placeholders for op in self.operations))
+        # Generated render function (see template_codegen), attached on demand by load_template
+        self.compiled = None
+
+    def __getstate__(self):
+        # Generated functions can't be pickled; they are rebuilt from the bytecode cache
+        state = self.__dict__.copy()
+        state['compiled'] = None
+        return state
+
+    def _parse(self, source: str):
+        """Parse the .prismo template source"""
+        # Same line splitting as reading the file in text mode
+        lines = io.StringIO(source, newline=None).readlines()
 
         i = 0
         while i < len(lines):
@@ -94,18 +165,54 @@ class PrismoTemplate:
                 elif directive == 'append':
                     self.operations.append(TemplateOperation('append', content))
 
+                elif directive == 'json':
+                    # Path to the node to replace, e.g. schemes[name=Pywal]
+                    self.operations.append(TemplateOperation('json', content, path=parse_json_path(args)))
+
+                elif directive == 'css':
+                    # Selector of the rule whose declarations are replaced
+                    self.operations.append(TemplateOperation('css', content, selector=args.strip()))
+
                 elif directive == 'prepend':
                     self.operations.append(TemplateOperation('prepend', content))
             else:
                 i += 1
 
-    def apply(self, colors: Dict[str, str], output_path: str):
+    def _compile(self):
+        """Pre-compile @match patterns so apply() doesn't recompile them on every call"""
+        for op in self.operations:
+            if op.op_type != 'match':
+                continue
+            pattern = op.params['pattern']
+            try:
+                if op.params.get('multiline', False):
+                    # Multiline mode: pattern can match across lines
+                    op.regex = re.compile(pattern, re.DOTALL)
+                else:
+                    # Single-line mode: pattern matches individual lines
+                    op.regex = re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid regex pattern '{pattern}': {e}")
+
+        # Patterns prone to catastrophic backtracking; only templates with one run time-limited
+        # in a worker process, the rest stay in-process
+        self.risky_patterns = []
+        match_ops = [op for op in self.operations if op.op_type == 'match']
+        if match_ops:
+            from regex_guard import needs_guard
+            self.risky_patterns = [op.params['pattern'] for op in match_ops
+                                   if needs_guard(op.params['pattern'], op.params.get('multiline', False))]
+
+    def apply(self, colors, output_path: str):
         """
         Apply the template with color substitutions
 
         Args:
-            colors: Dictionary of color names to hex values (from wal)
+            colors: Dictionary of color names to hex values (from wal), or a prebuilt ColorTable
             output_path: Target file path (from config)
+
+        Returns:
+            bool: True if the target was written, False if it was already up to date
         """
         if not output_path:
             raise ValueError("No target path specified")
@@ -113,154 +220,476 @@ class PrismoTemplate:
         # Expand user home directory and environment variables
         target = os.path.expandvars(os.path.expanduser(output_path))
 
-        # Read existing file or start with empty
+        original, file_lines, fmt = read_target(target)
+        file_lines = self.transform(file_lines, colors)
+        return write_target(target, original, file_lines, fmt)
+
+    def transform(self, file_lines: List[str], colors, regex_timeout: float = 0) -> List[str]:
+        """
+        Apply the template's operations to an in-memory copy of a file
+
+        Args:
+            file_lines: Current lines of the target (left unmodified)
+            colors: Dictionary of color names to hex values (from wal), or a prebuilt ColorTable
+            regex_timeout: Seconds the template may run before it is stopped and reported as failed,
+                           when it has @match patterns flagged by regex_guard.lint_pattern (0 runs
+                           every pattern in this process without a limit)
+
+        Returns:
+            list: The transformed lines
+        """
+        # Derived color values (shared across templates when a ColorTable is passed in)
+        contents = list(self._render_all(ColorTable.of(colors)))
+
+        if regex_timeout and self.risky_patterns:
+            # One call to a worker process that is killed if a pattern backtracks for too long
+            from regex_guard import run_guarded
+            return run_guarded(apply_operations, (self.operations, contents, file_lines),
+                               regex_timeout, self.risky_patterns)
+        return apply_operations(self.operations, contents, file_lines)
+
+    def rendered(self, colors) -> List[Tuple[TemplateOperation, str]]:
+        """
+        Substitute colors into every operation without applying them
+
+        Args:
+            colors: Dictionary of color names to hex values (from wal), or a prebuilt ColorTable
+
+        Returns:
+            list: (operation, rendered content) pairs in template order
+        """
+        return list(zip(self.operations, self._render_all(ColorTable.of(colors))))
+
+    def _render_all(self, table: 'ColorTable'):
+        """Rendered content of every operation, through the generated function when there is one"""
+        if self.compiled is not None:
+            return self.compiled(table.values)
+        return [self._render(op, table) for op in self.operations]
+
+    def _render(self, op: TemplateOperation, table: 'ColorTable') -> str:
+        """Fill the operation's pre-tokenized content from the color table in one pass"""
+        values = table.values
+        parts = []
+        for seg in op.segments:
+            if seg.__class__ is str:
+                parts.append(seg)
+            else:
+                # Unknown colors/components are left as literal text
+                parts.append(values.get(seg) or placeholder_text(seg))
+        return ''.join(parts)
+
+
+def apply_operations(operations: List[TemplateOperation], contents: List[str], file_lines: List[str]) -> List[str]:
+    """
+    Apply operations with their rendered contents to a copy of a file's lines (module level so a
+    template can also run in a guarded worker process)
+
+    Args:
+        operations: Template operations in order
+        contents: Rendered content of each operation
+        file_lines: Current lines of the target (left unmodified)
+
+    Returns:
+        list: The transformed lines
+    """
+    file_lines = list(file_lines)
+
+    for op, content in zip(operations, contents):
+        if op.op_type == 'full':
+            # Replace entire file with content
+            file_lines = content.split('\n')
+
+        elif op.op_type == 'line':
+            line_num = op.params['line_num']
+            if line_num < 1:
+                raise ValueError(f"Line number must be >= 1, got {line_num}")
+            # Ensure file has enough lines
+            while len(file_lines) < line_num:
+                file_lines.append('')
+            file_lines[line_num - 1] = content
+
+        elif op.op_type == 'lines':
+            start = op.params['start']
+            end = op.params['end']
+            if start < 1 or end < 1:
+                raise ValueError(f"Line numbers must be >= 1, got start={start}, end={end}")
+            if start > end:
+                raise ValueError(f"Start line ({start}) must be <= end line ({end})")
+            # Ensure file has enough lines
+            while len(file_lines) < end:
+                file_lines.append('')
+
+            # Split content into lines
+            new_lines = content.split('\n')
+            # Replace the range (inclusive)
+            file_lines[start-1:end] = new_lines
+
+        elif op.op_type == 'match':
+            multiline = op.params.get('multiline', False)
+            file_lines = apply_match(op.regex, multiline, content, file_lines)
+
+            # Note: Not raising an error if no matches found, as this might be intentional
+
+        elif op.op_type == 'append':
+            content_lines = content.split('\n')
+            file_lines.extend(content_lines)
+
+        elif op.op_type == 'prepend':
+            content_lines = content.split('\n')
+            file_lines = content_lines + file_lines
+
+        elif op.op_type == 'json':
+            # Scan the document once and replace only the addressed node
+            file_lines = patch_json('\n'.join(file_lines), op.params['path'], content).split('\n')
+
+        elif op.op_type == 'css':
+            file_lines = patch_css('\n'.join(file_lines), op.params['selector'], content).split('\n')
+
+    return file_lines
+
+
+def apply_match(regex, multiline: bool, content: str, file_lines: List[str]) -> List[str]:
+    """
+    Apply one @match operation
+
+    Args:
+        regex: Compiled pattern
+        multiline: Match across the whole file instead of line by line
+        content: Rendered replacement content
+        file_lines: Current lines of the target
+
+    Returns:
+        list: The transformed lines
+    """
+    new_lines = content.split('\n')
+
+    if multiline:
+        # Multiline matching: join all lines and search for pattern
+        full_text = '\n'.join(file_lines)
+
+        # Replace all matches in the full text
+        # The content can contain backreferences like $1, $2, etc.
+        # We need to expand them using the match groups
+        def replacer(match):
+            result = content
+            # Replace $1, $2, etc. with captured groups
+            for i in range(len(match.groups()) + 1):
+                result = result.replace(f'${i}', match.group(i) if i < len(match.groups()) + 1 else '')
+            return result
+
+        result_text = regex.sub(replacer, full_text)
+        return result_text.split('\n')
+
+    # Single-line matching: search each line individually, building the
+    # output in one forward pass (inserted lines are never re-matched)
+    return match_lines(regex, file_lines, new_lines)
+
+
+def match_lines(regex, file_lines: List[str], new_lines: List[str]) -> List[str]:
+    """
+    Replace every line matching regex with new_lines, in linear time.
+
+    Args:
+        regex: Compiled single-line pattern
+        file_lines: Lines of the target
+        new_lines: Replacement lines for each match
+
+    Returns:
+        list: New list of lines
+    """
+    search = regex.search
+    output = []
+    append = output.append
+    extend = output.extend
+    for line in file_lines:
+        if search(line):
+            # Replace with new content (could be multiple lines)
+            extend(new_lines)
+        else:
+            append(line)
+    return output
+
+
+def placeholder_text(seg: tuple) -> str:
+    """Literal template text of a (name, component) placeholder"""
+    name, component = seg
+    return '{%s}' % name if component is None else '{%s.%s}' % (name, component)
+
+
+class TargetFormat(NamedTuple):
+    """How a target file is encoded on disk, so it can be written back the same way"""
+    encoding: str
+    bom: bytes
+    newline: str
+
+
+# Byte order marks recognised on targets, and the codec for the text after them
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+
+def new_target_format() -> TargetFormat:
+    """Format used for targets that don't exist yet (same as a text-mode write)"""
+    return TargetFormat('utf-8', b'', os.linesep)
+
+
+def decode_target(raw: bytes) -> Tuple[str, TargetFormat]:
+    """
+    Decode a target file and detect its encoding, BOM and newline style from one buffer
+
+    Args:
+        raw: Complete file contents
+
+    Returns:
+        tuple: (text with '\n' newlines, detected TargetFormat)
+    """
+    for bom, encoding in BOMS:
+        if raw.startswith(bom):
+            text = raw[len(bom):].decode(encoding, errors='replace')
+            break
+    else:
+        bom = b''
+        try:
+            encoding = 'utf-8'
+            text = raw.decode(encoding)
+        except UnicodeDecodeError:
+            # cp850 maps every byte, so this never fails
+            encoding = 'cp850'
+            text = raw.decode(encoding)
+
+    # The first line break decides the style; files without one get the platform default
+    first = text.find('\n')
+    if first > 0 and text[first - 1] == '\r':
+        newline = '\r\n'
+    elif first >= 0:
+        newline = '\n'
+    elif '\r' in text:
+        newline = '\r'
+    else:
+        newline = os.linesep
+
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text, TargetFormat(encoding, bom, newline)
+
+
+def encode_target(file_lines: List[str], fmt: TargetFormat) -> bytes:
+    """Encode lines in a target's original encoding, BOM and newline style"""
+    text = '\n'.join(file_lines)
+    if fmt.newline != '\n':
+        text = text.replace('\n', fmt.newline)
+    try:
+        return fmt.bom + text.encode(fmt.encoding)
+    except UnicodeEncodeError:
+        # Rendered content the legacy code page can't represent: switch the file to utf-8
+        return text.encode('utf-8')
+
+
+def read_target(target: str) -> Tuple[Optional[bytes], List[str], TargetFormat]:
+    """
+    Read a target file for transformation with a single read
+
+    Args:
+        target: Expanded target file path
+
+    Returns:
+        tuple: (raw bytes or None if the file doesn't exist, decoded lines, TargetFormat)
+    """
+    if not os.path.exists(target):
+        return None, [], new_target_format()
+    with open(target, 'rb') as f:
+        original = f.read()
+    text, fmt = decode_target(original)
+    return original, text.split('\n'), fmt
+
+
+def write_target(target: str, original: Optional[bytes], file_lines: List[str], fmt: TargetFormat) -> bool:
+    """
+    Write transformed lines back to a target, unless they match what is already on disk
+
+    Args:
+        target: Expanded target file path
+        original: Bytes read by read_target (None if the file didn't exist)
+        file_lines: Lines to write
+        fmt: Encoding, BOM and newline style detected by read_target
+
+    Returns:
+        bool: True if the target was written, False if it was already up to date
+    """
+    data = encode_target(file_lines, fmt)
+
+    # Skip the write when nothing changed (apps watching the file would reload the theme)
+    if original is not None and len(original) == len(data) and original == data:
+        return False
+
+    # Write result - create directory if it doesn't exist
+    target_dir = os.path.dirname(target)
+    if target_dir:  # Only create if there is a directory component
+        os.makedirs(target_dir, exist_ok=True)
+
+    write_atomic(target, data)
+    return True
+
+
+def write_atomic(target: str, data: bytes):
+    """
+    Write a file via a temporary file in the same directory and an atomic replace,
+    so readers never see a half-written file
+
+    Args:
+        target: Destination file path (a symlink is written through to the file it points to)
+        data: Complete file contents
+    """
+    # Replacing a symlink would swap the link itself for a regular file, so work on its target
+    target = os.path.realpath(target)
+    fd, tmp_path = temp_beside(target)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    replace_file(tmp_path, target)
+
+
+def temp_beside(target: str) -> Tuple[int, str]:
+    """
+    Create a temporary file in the target's directory (same filesystem, so it can be renamed over it)
+
+    Args:
+        target: Destination file path, already resolved with os.path.realpath
+    """
+    target_dir = os.path.dirname(target) or '.'
+    return tempfile.mkstemp(prefix='.' + os.path.basename(target) + '.', suffix='.tmp', dir=target_dir)
+
+
+def replace_file(tmp_path: str, target: str):
+    """
+    Move a finished temporary file over the target atomically
+
+    Args:
+        tmp_path: Temporary file created by temp_beside
+        target: Destination file path, already resolved with os.path.realpath
+    """
+    try:
+        # Keep the permissions of the file being replaced, or use what open() would give a new
+        # file; mkstemp creates 0600
         if os.path.exists(target):
-            try:
-                with open(target, 'r', encoding='utf-8') as f:
-                    file_lines = f.read().split('\n')
-            except UnicodeDecodeError:
-                # Try with different encodings
-                try:
-                    with open(target, 'r', encoding='cp850') as f:
-                        file_lines = f.read().split('\n')
-                except:
-                    # Last resort: binary read and decode with errors ignored
-                    with open(target, 'r', encoding='utf-8', errors='ignore') as f:
-                        file_lines = f.read().split('\n')
+            os.chmod(tmp_path, os.stat(target).st_mode & 0o7777)
         else:
-            file_lines = []
+            os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, target)
+    except PermissionError:
+        # Windows refuses to replace a file another process holds open; write in place instead
+        shutil.copyfile(tmp_path, target)
+        os.remove(tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ColorTable:
+    """
+    Every placeholder value for one palette, built once and shared by all templates in a run.
+
+    Components:
+        r, g, b          RGB 0-255
+        h, l, s          HLS hue (0-360), lightness and saturation (0-100%)
+        rgb              "r, g, b" (0-255)
+        rgbf             "r, g, b" (0-1 floats)
+        rgba             8-digit hex with opaque alpha, without #
+        hsv_h, hsv_s, hsv_v  HSV hue (0-360), saturation and value (0-100%)
+        oklch            "L% C H" for CSS oklch()
+        lightenN/darkenN hex mixed with N% white/black (N in MIX_STEPS), without #
+    """
 
-        # Apply each operation
-        for op in self.operations:
-            # Substitute color variables in content
-            content = self._substitute_colors(op.content, colors)
-
-            if op.op_type == 'full':
-                # Replace entire file with content
-                file_lines = content.split('\n')
-
-            elif op.op_type == 'line':
-                line_num = op.params['line_num']
-                if line_num < 1:
-                    raise ValueError(f"Line number must be >= 1, got {line_num}")
-                # Ensure file has enough lines
-                while len(file_lines) < line_num:
-                    file_lines.append('')
-                file_lines[line_num - 1] = content
-
-            elif op.op_type == 'lines':
-                start = op.params['start']
-                end = op.params['end']
-                if start < 1 or end < 1:
-                    raise ValueError(f"Line numbers must be >= 1, got start={start}, end={end}")
-                if start > end:
-                    raise ValueError(f"Start line ({start}) must be <= end line ({end})")
-                # Ensure file has enough lines
-                while len(file_lines) < end:
-                    file_lines.append('')
-
-                # Split content into lines
-                new_lines = content.split('\n')
-                # Replace the range (inclusive)
-                file_lines[start-1:end] = new_lines
-
-            elif op.op_type == 'match':
-                pattern = op.params['pattern']
-                multiline = op.params.get('multiline', False)
-
-                try:
-                    if multiline:
-                        # Multiline mode: pattern can match across lines
-                        regex = re.compile(pattern, re.DOTALL)
-                    else:
-                        # Single-line mode: pattern matches individual lines
-                        regex = re.compile(pattern)
-                except re.error as e:
-                    raise ValueError(f"Invalid regex pattern '{pattern}': {e}")
-
-                new_lines = content.split('\n')
-
-                if multiline:
-                    # Multiline matching: join all lines and search for pattern
-                    full_text = '\n'.join(file_lines)
-
-                    # Replace all matches in the full text
-                    # The content can contain backreferences like $1, $2, etc.
-                    # We need to expand them using the match groups
-                    def replacer(match):
-                        result = content
-                        # Replace $1, $2, etc. with captured groups
-                        for i in range(len(match.groups()) + 1):
-                            result = result.replace(f'${i}', match.group(i) if i < len(match.groups()) + 1 else '')
-                        return result
-
-                    result_text = regex.sub(replacer, full_text)
-                    file_lines = result_text.split('\n')
-                else:
-                    # Single-line matching: search each line individually
-                    i = 0
-                    matches_found = 0
-                    while i < len(file_lines):
-                        if regex.search(file_lines[i]):
-                            # Replace with new content (could be multiple lines)
-                            file_lines[i:i+1] = new_lines
-                            i += len(new_lines)
-                            matches_found += 1
-                        else:
-                            i += 1
-
-                # Note: Not raising an error if no matches found, as this might be intentional
-
-            elif op.op_type == 'append':
-                content_lines = content.split('\n')
-                file_lines.extend(content_lines)
-
-            elif op.op_type == 'prepend':
-                content_lines = content.split('\n')
-                file_lines = content_lines + file_lines
-
-        # Write result - create directory if it doesn't exist
-        target_dir = os.path.dirname(target)
-        if target_dir:  # Only create if there is a directory component
-            os.makedirs(target_dir, exist_ok=True)
-
-        with open(target, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(file_lines))
-
-    def _substitute_colors(self, content: str, colors: Dict[str, str]) -> str:
-        """Substitute color variables in content"""
-        result = content
-
-        for color_name, color_hex in colors.items():
-            # Strip leading # from color_hex for better applicability
-            color_hex_no_hash = color_hex.lstrip('#')
-
-            # Replace full color {colorN}
-            result = result.replace(f'{{{color_name}}}', color_hex_no_hash)
-
-            # Replace component colors if present
-            if f'{{{color_name}.' in result:
-                # Convert hex to RGB (use stripped version)
-                rgb = self._hex_to_rgb(color_hex_no_hash)
-                # Convert RGB to HLS
-                hls = rgb_to_hls(*[c / 255.0 for c in rgb])
-                hls_values = [
-                    hls[0] * 360,      # Hue (0-360)
-                    hls[1] * 100,      # Lightness (0-100%)
-                    hls[2] * 100       # Saturation (0-100%)
-                ]
-
-                # Replace RGB components
-                result = result.replace(f'{{{color_name}.r}}', str(rgb[0]))
-                result = result.replace(f'{{{color_name}.g}}', str(rgb[1]))
-                result = result.replace(f'{{{color_name}.b}}', str(rgb[2]))
-
-                # Replace HLS components
-                result = result.replace(f'{{{color_name}.h}}', f'{hls_values[0]}')
-                result = result.replace(f'{{{color_name}.l}}', f'{hls_values[1]}%')
-                result = result.replace(f'{{{color_name}.s}}', f'{hls_values[2]}%')
-
-        return result
+    # Percentages precomputed for {name.lightenN} / {name.darkenN}
+    MIX_STEPS = (5, 10, 15, 20, 25, 30, 40, 50)
+
+    def __init__(self, colors: Dict[str, str]):
+        self.colors = dict(colors)
+        self.values: Dict[tuple, str] = {}
+        self._build()
+
+    @classmethod
+    def of(cls, colors) -> 'ColorTable':
+        """Use an existing table as-is, or build one from a color dict"""
+        return colors if isinstance(colors, ColorTable) else cls(colors)
+
+    def _build(self):
+        import numpy as np
+
+        names = list(self.colors)
+        if not names:
+            return
+        hexes = [self.colors[name].lstrip('#') for name in names]
+        rgb_int = [self._hex_to_rgb(h) for h in hexes]
+
+        # Original components, via colorsys so their text matches earlier releases exactly
+        for name, hex_color, rgb in zip(names, hexes, rgb_int):
+            hls = rgb_to_hls(*[c / 255.0 for c in rgb])
+            self.values.update({
+                (name, None): hex_color,
+                (name, 'r'): str(rgb[0]),
+                (name, 'g'): str(rgb[1]),
+                (name, 'b'): str(rgb[2]),
+                (name, 'h'): f'{hls[0] * 360}',
+                (name, 'l'): f'{hls[1] * 100}%',
+                (name, 's'): f'{hls[2] * 100}%',
+            })
+
+        # Extended formats for the whole palette at once
+        rgb255 = np.array(rgb_int, dtype=np.float64)
+        rgb = rgb255 / 255.0
+
+        # HSV
+        maxc = rgb.max(axis=1)
+        minc = rgb.min(axis=1)
+        delta = maxc - minc
+        safe_delta = np.where(delta == 0, 1, delta)
+        r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+        hue = np.select(
+            [delta == 0, maxc == r, maxc == g],
+            [0.0, ((g - b) / safe_delta) % 6, (b - r) / safe_delta + 2],
+            (r - g) / safe_delta + 4) * 60
+        hsv_s = np.where(maxc == 0, 0, delta / np.where(maxc == 0, 1, maxc)) * 100
+        hsv_v = maxc * 100
+
+        # OKLCH (sRGB -> linear -> LMS -> Oklab -> polar)
+        linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+        lms = linear @ np.array([
+            [0.4122214708, 0.5363325363, 0.0514459929],
+            [0.2119034982, 0.6806995451, 0.1073969566],
+            [0.0883024619, 0.2817188376, 0.6299787005]]).T
+        lab = np.cbrt(lms) @ np.array([
+            [0.2104542553, 0.7936177850, -0.0040720468],
+            [1.9779984951, -2.4285922050, 0.4505937099],
+            [0.0259040371, 0.7827717662, -0.8086757660]]).T
+        chroma = np.hypot(lab[:, 1], lab[:, 2])
+        # Hue is meaningless for grays; report 0 instead of rounding noise
+        ok_hue = np.where(chroma < 1e-4, 0.0, np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360)
+
+        # Mixes with black/white, like CSS color-mix(in srgb, color, black N%)
+        steps = np.array(self.MIX_STEPS, dtype=np.float64)[None, :, None] / 100
+        darkened = np.floor(rgb255[:, None, :] * (1 - steps) + 0.5).astype(int)
+        lightened = np.floor(rgb255[:, None, :] + (255 - rgb255[:, None, :]) * steps + 0.5).astype(int)
+
+        for i, name in enumerate(names):
+            self.values.update({
+                (name, 'rgb'): '%d, %d, %d' % rgb_int[i],
+                (name, 'rgbf'): ', '.join(_fmt(c, 3) for c in rgb[i]),
+                (name, 'rgba'): hexes[i] + 'ff',
+                (name, 'hsv_h'): _fmt(hue[i]),
+                (name, 'hsv_s'): _fmt(hsv_s[i]) + '%',
+                (name, 'hsv_v'): _fmt(hsv_v[i]) + '%',
+                (name, 'oklch'): '%s%% %s %s' % (_fmt(lab[i, 0] * 100), _fmt(chroma[i], 4), _fmt(ok_hue[i])),
+            })
+            for j, step in enumerate(self.MIX_STEPS):
+                self.values[(name, 'darken%d' % step)] = '%02x%02x%02x' % tuple(darkened[i, j])
+                self.values[(name, 'lighten%d' % step)] = '%02x%02x%02x' % tuple(lightened[i, j])
 
     @staticmethod
     def _hex_to_rgb(hex_color: str) -> Tuple[int, int, int]:
@@ -269,14 +698,326 @@ class PrismoTemplate:
         return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
 
 
-def apply_template(template_path: str, colors: Dict[str, str], output_path: str):
+def _fmt(value: float, digits: int = 2) -> str:
+    """Format a float with at most `digits` decimals and no trailing zeros"""
+    return ('%.*f' % (digits, value)).rstrip('0').rstrip('.')
+
+
+def _disk_cache_path(template_path: str) -> str:
+    """Location of the on-disk compiled cache for a template"""
+    folder, name = os.path.split(template_path)
+    return os.path.join(folder, DISK_CACHE_DIR, name + '.pickle')
+
+
+def _load_disk_cache(template_path: str, source_hash: str) -> Optional[PrismoTemplate]:
+    """Load a compiled template from disk if it was built from the same source"""
+    cache_path = _disk_cache_path(template_path)
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('version') == CACHE_VERSION and cached.get('hash') == source_hash:
+            return cached['template']
+    except Exception:
+        pass
+    return None
+
+
+def _save_disk_cache(template_path: str, template: PrismoTemplate):
+    """Write a compiled template next to its source (failures are non-fatal)"""
+    cache_path = _disk_cache_path(template_path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path + '.tmp', 'wb') as f:
+            pickle.dump({'version': CACHE_VERSION, 'hash': template.source_hash, 'template': template}, f)
+        os.replace(cache_path + '.tmp', cache_path)
+    except Exception as e:
+        print(f"Warning: Could not write template cache for {template_path}: {e}")
+
+
+def load_template(template_path: str, disk_cache: bool = False, compile_templates: bool = False) -> PrismoTemplate:
+    """
+    Get the compiled template for a .prismo file, reusing cached compilations.
+
+    Templates are cached in memory keyed by path and validated by mtime/size; if those
+    change, the file is re-read and only re-parsed when its content hash differs.
+
+    Args:
+        template_path: Path to .prismo template file
+        disk_cache: Also persist compiled templates in a __prismocache__ folder next to the template
+        compile_templates: Attach a generated Python render function (see template_codegen)
+
+    Returns:
+        PrismoTemplate: Parsed template with pre-compiled patterns
+    """
+    key = os.path.abspath(template_path)
+    st = os.stat(key)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    cached = _template_cache.get(key)
+    if cached and cached[0] == stamp:
+        template = cached[2]
+    else:
+        with open(key, 'rb') as f:
+            source = f.read()
+        source_hash = hashlib.sha256(source).hexdigest()
+
+        if cached and cached[1] == source_hash:
+            # Touched but unchanged
+            template = cached[2]
+        else:
+            template = _load_disk_cache(key, source_hash) if disk_cache else None
+            if template is None:
+                template = PrismoTemplate(key, source)
+                if disk_cache:
+                    _save_disk_cache(key, template)
+        _template_cache[key] = (stamp, source_hash, template)
+
+    if compile_templates and template.compiled is None:
+        from template_codegen import compile_template
+        template.compiled = compile_template(template, disk_cache)
+    return template
+
+
+def apply_template(template_path: str, colors, output_path: str, disk_cache: bool = False):
     """
     Convenience function to apply a template
 
     Args:
         template_path: Path to .prismo template file
-        colors: Dictionary of color names to hex values
+        colors: Dictionary of color names to hex values, or a ColorTable shared across templates
+        output_path: Target file path (from config)
+        disk_cache: Persist the compiled template on disk as well as in memory
+
+    Returns:
+        bool: True if the target was written, False if it was already up to date
+    """
+    template = load_template(template_path, disk_cache)
+    return template.apply(colors, output_path)
+
+
+def apply_templates(template_paths: List[str], colors, output_path: str, disk_cache: bool = False, state=None,
+                    stream_threshold: int = 0, regex_timeout: float = 0, compile_templates: bool = False):
+    """
+    Apply several templates to the same output file, reading and writing it only once
+
+    Templates are applied in order to one in-memory buffer. A template that fails is
+    skipped (the buffer keeps the previous templates' changes) and reported in errors.
+
+    Args:
+        template_paths: Paths to .prismo template files, in config order
+        colors: Dictionary of color names to hex values, or a ColorTable shared across templates
         output_path: Target file path (from config)
+        disk_cache: Persist compiled templates on disk as well as in memory
+        state: Optional RunState; the target is left alone when its templates, the color
+               values they reference and the file itself are unchanged since the last run
+        stream_threshold: Existing targets at least this many bytes are patched in chunks instead of
+                          in memory when all their templates use only @line/@lines/@append/@prepend
+                          (0 disables streaming)
+        regex_timeout: Seconds each @match may run before the template is stopped and reported
+                       as failed (0 disables the guard)
+        compile_templates: Render through generated Python functions instead of interpreting
+                           each template's content
+
+    Returns:
+        tuple: (True if the target was written, list of error messages or None per template)
+    """
+    if not output_path:
+        raise ValueError("No target path specified")
+
+    target = os.path.expandvars(os.path.expanduser(output_path))
+    table = ColorTable.of(colors)
+
+    templates = []
+    errors = []
+    for template_path in template_paths:
+        try:
+            templates.append(load_template(template_path, disk_cache, compile_templates))
+            errors.append(None)
+        except Exception as e:
+            templates.append(None)
+            errors.append(str(e))
+
+    # Nothing to apply: leave the target (or its absence) untouched
+    if all(errors):
+        return False, errors
+
+    inputs = None
+    if state is not None:
+        inputs = run_inputs(templates, table)
+        if state.is_current(target, inputs):
+            return False, errors
+
+    if stream_threshold and os.path.isfile(target) and os.path.getsize(target) >= stream_threshold:
+        from target_stream import can_stream, stream_templates
+        if can_stream(templates):
+            written = stream_templates(templates, table, target, errors)
+            if written is not None:
+                if state is not None and not any(errors):
+                    state.record(target, inputs)
+                return written, errors
+
+    original, file_lines, fmt = read_target(target)
+    for i, template in enumerate(templates):
+        if template is None:
+            continue
+        try:
+            file_lines = template.transform(file_lines, table, regex_timeout)
+        except Exception as e:
+            errors[i] = str(e)
+
+    if all(errors):
+        return False, errors
+    written = write_target(target, original, file_lines, fmt)
+    # Only a fully successful run can be skipped next time, otherwise failures would go unreported
+    if state is not None and not any(errors):
+        state.record(target, inputs)
+    return written, errors
+
+
+def render(template, palette, base_text: str = "", regex_timeout: float = 0) -> str:
+    """
+    Render a template in memory, without reading or writing its target
+
+    Args:
+        template: PrismoTemplate or path to a .prismo file
+        palette: Dictionary of color names to hex values, or a ColorTable
+        base_text: Text the template is applied to, standing in for the target's current contents
+        regex_timeout: Seconds each @match may run before it is stopped (0 disables the guard)
+
+    Returns:
+        str: The resulting text, with '\n' newlines
+    """
+    if not isinstance(template, PrismoTemplate):
+        template = load_template(template)
+    base_text = base_text.replace('\r\n', '\n').replace('\r', '\n')
+    file_lines = base_text.split('\n') if base_text else []
+    return '\n'.join(template.transform(file_lines, palette, regex_timeout))
+
+
+# Palettes needed before a matrix is split across processes. Each palette costs ~2 ms (building
+# its ColorTable) plus a few microseconds per template, while starting a spawn pool takes about
+# a second, so smaller matrices finish sooner in-process
+MATRIX_POOL_MIN = 2000
+
+# Templates and base texts shared by every row a matrix worker renders
+_matrix_jobs: List[Tuple[Optional[PrismoTemplate], str]] = []
+
+
+def _compile_jobs(jobs: List[Tuple[Optional[PrismoTemplate], str]]):
+    """Attach generated render functions, since each template is rendered once per palette"""
+    from template_codegen import compile_template
+    for template, _ in jobs:
+        if template is not None and template.compiled is None:
+            template.compiled = compile_template(template)
+
+
+def _matrix_init(jobs: List[Tuple[Optional[PrismoTemplate], str]]):
+    """Worker initializer: receive the templates once instead of with every palette"""
+    global _matrix_jobs
+    _compile_jobs(jobs)
+    _matrix_jobs = jobs
+
+
+def _render_row(palette, jobs=None) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+    """Render every template against one palette, sharing its color table"""
+    if jobs is None:
+        jobs = _matrix_jobs
+    outputs = []
+    errors = []
+    try:
+        table = ColorTable.of(palette)
+    except Exception as e:
+        return [None] * len(jobs), [str(e)] * len(jobs)
+    for template, base_text in jobs:
+        if template is None:
+            outputs.append(None)
+            errors.append(None)  # filled in with the load error by render_matrix
+            continue
+        try:
+            outputs.append(render(template, table, base_text))
+            errors.append(None)
+        except Exception as e:
+            outputs.append(None)
+            errors.append(str(e))
+    return outputs, errors
+
+
+def render_matrix(palettes: list, templates: list, base_texts: Optional[List[str]] = None, workers: Optional[int] = None):
+    """
+    Render every template against every palette in memory (previews, diffs, theme packs)
+
+    Templates are rendered through generated functions (see template_codegen). With at least
+    MATRIX_POOL_MIN palettes, the palettes are split across worker processes; callers using
+    workers must guard their entry point with if __name__ == '__main__'.
+
+    Args:
+        palettes: Color dicts (name -> hex) or ColorTables
+        templates: PrismoTemplates or paths to .prismo files
+        base_texts: Text each template is applied to, aligned with templates (default: empty)
+        workers: Number of worker processes (None = CPU count, 1 = render in-process)
+
+    Returns:
+        tuple: (outputs, errors), both lists of rows (one per palette) with one entry per template:
+               the rendered text or None, and the error message or None
+    """
+    if base_texts is None:
+        base_texts = [""] * len(templates)
+    if len(base_texts) != len(templates):
+        raise ValueError(f"Got {len(base_texts)} base texts for {len(templates)} templates")
+
+    jobs = []
+    load_errors = []
+    for template, base_text in zip(templates, base_texts):
+        try:
+            if not isinstance(template, PrismoTemplate):
+                template = load_template(template)
+            jobs.append((template, base_text))
+            load_errors.append(None)
+        except Exception as e:
+            jobs.append((None, base_text))
+            load_errors.append(str(e))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(palettes)))
+
+    if workers == 1 or len(palettes) < MATRIX_POOL_MIN:
+        _compile_jobs(jobs)
+        rows = [_render_row(palette, jobs) for palette in palettes]
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn: forking a process that may be running other threads (GUI, server) isn't safe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_matrix_init, initargs=(jobs,)) as pool:
+            rows = list(pool.map(_render_row, palettes, chunksize=max(1, len(palettes) // (workers * 4))))
+
+    outputs = [row for row, _ in rows]
+    errors = [[load_error or error for load_error, error in zip(load_errors, row_errors)] for _, row_errors in rows]
+    return outputs, errors
+
+
+def run_inputs(templates: List[Optional[PrismoTemplate]], table: 'ColorTable') -> dict:
+    """
+    Describe what a target's output depends on, for RunState comparisons
+
+    Args:
+        templates: Loaded templates for the target in order (None for ones that failed to load)
+        table: Color table the templates are rendered from
+
+    Returns:
+        dict: JSON-compatible template hashes and referenced color values
     """
-    template = PrismoTemplate(template_path)
-    template.apply(colors, output_path)
+    values = {}
+    for template in templates:
+        if template is None:
+            continue
+        for ref in template.references:
+            values[placeholder_text(ref)] = table.values.get(ref)
+    return {
+        "version": CACHE_VERSION,
+        "templates": [template.source_hash if template else None for template in templates],
+        "values": values
+    }
@@ -0,0 +1,129 @@
+"""
+ImageMagick Backend for Prismo
+pywal's ImageMagick extraction with the binary discovered once and cached in the data directory
+"""
+
+import os
+import re
+import shutil
+from json import loads, dumps
+from os import path
+from subprocess import check_output, STDOUT
+
+import pywal.backends.wal
+
+import config_manager
+
+
+# Hex colors in ImageMagick's txt: output (the "# ImageMagick pixel enumeration" header doesn't match)
+HEX_PATTERN = re.compile(r"#[0-9a-f]{6}", re.IGNORECASE)
+
+# Resolved command, memoized for the lifetime of the process
+_command = None
+
+
+def _cache_path():
+    return path.join(config_manager.data_path, "magick.json")
+
+
+def _probe():
+    """Search PATH for ImageMagick without spawning a process"""
+    magick = shutil.which("magick")
+    if magick:
+        return [magick]
+
+    # ImageMagick 6: only trust "convert" next to "montage" (Windows ships an unrelated convert.exe)
+    montage = shutil.which("montage")
+    if montage:
+        folder = path.dirname(montage)
+        convert = shutil.which("convert", path=folder)
+        if convert:
+            return [convert]
+    return None
+
+
+def find_magick():
+    """
+    Get the ImageMagick command, using the path cached in the data directory while it still exists.
+
+    Returns:
+        list or None: Command prefix (e.g. ["C:\\...\\magick.exe"]), or None if ImageMagick isn't installed
+    """
+    global _command
+
+    cache_file = _cache_path()
+    cached = _command
+    if cached is None and path.isfile(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                cached = loads(f.read())
+        except Exception:
+            cached = None
+
+    # A single stat validates the cached binary; re-probe only if it moved or changed
+    if cached:
+        try:
+            if os.stat(cached["command"][0]).st_mtime == cached["mtime"]:
+                _command = cached
+                return list(cached["command"])
+        except (OSError, KeyError, IndexError, TypeError):
+            pass
+
+    command = _probe()
+    if command is None:
+        _command = None
+        return None
+
+    _command = {"command": command, "mtime": os.stat(command[0]).st_mtime}
+    try:
+        os.makedirs(path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, 'w') as f:
+            f.write(dumps(_command))
+    except Exception as e:
+        print(f"Warning: Could not cache ImageMagick path: {e}")
+    return list(command)
+
+
+def imagemagick(color_count, img, command, prescaled=False):
+    """Call ImageMagick to quantize the image, returning its txt: output lines"""
+    # pywal shrinks the image to 25% first; a working copy is already reduced to the pixel budget
+    resize = [] if prescaled else ["-resize", "25%"]
+    flags = [*resize, "-colors", str(color_count), "-unique-colors", "txt:-"]
+    return check_output([*command, img + "[0]", *flags], stderr=STDOUT).splitlines()
+
+
+def gen_colors(img, prescaled=False):
+    """
+    Generate the raw (unadjusted) color list for an image, like pywal.backends.wal.gen_colors
+
+    Args:
+        img (str): Path to the image
+        prescaled (bool): The image is a working copy already within the pixel budget, so it is
+                          quantized as-is instead of being shrunk to 25% again
+    """
+    command = find_magick()
+    if command is None:
+        raise RuntimeError("Imagemagick isn't installed to system path")
+
+    # Some images quantize to fewer unique colors than requested; ask for more until 16 come back
+    for color_count in range(16, 36):
+        raw = imagemagick(color_count, img, command, prescaled)
+        colors = [m.group() for m in (HEX_PATTERN.search(line.decode(errors="ignore")) for line in raw) if m]
+        if len(colors) >= 16:
+            return colors
+
+    if not colors:
+        raise RuntimeError("Imagemagick couldn't generate a palette for " + img)
+    while len(colors) < 16:
+        colors.extend(colors)
+    return colors
+
+
+def adjust(colors, light):
+    """Apply pywal's light/dark adjustment to a raw color list"""
+    return pywal.backends.wal.adjust(colors, light)
+
+
+def get(img, light=False, prescaled=False):
+    """Get colorscheme, matching the interface of pywal's backends"""
+    return adjust(gen_colors(img, prescaled), light)
@@ -0,0 +1,103 @@
+"""
+Wallpaper Watcher for Prismo
+Long-running mode that regenerates colors whenever the wallpaper changes
+"""
+
+import os
+import threading
+import time
+from os import path
+
+from palette_cache import hash_file
+
+
+def wallpaper_source():
+    """
+    Source that follows the current Windows wallpaper.
+
+    Returns:
+        callable: Returns the wallpaper path from the registry, or the TranscodedWallpaper fallback
+    """
+    from main import get_wallpaper
+    from config_manager import home
+
+    fallback = home + "\\AppData\\Roaming\\Microsoft\\Windows\\Themes\\TranscodedWallpaper"
+
+    def resolve():
+        try:
+            return get_wallpaper() or fallback
+        except Exception:
+            return fallback
+    return resolve
+
+
+def file_source(file_path):
+    """
+    Source that follows a fixed image path (useful on Linux and for testing).
+
+    Returns:
+        callable: Returns the given path
+    """
+    resolved = path.abspath(path.expandvars(path.expanduser(file_path)))
+    return lambda: resolved
+
+
+def signature(file_path):
+    """Cheap change signature of a file: (path, mtime, size), or None if it is missing"""
+    try:
+        st = os.stat(file_path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return (file_path, st.st_mtime_ns, st.st_size)
+
+
+def watch(source, on_change, interval=2.0, debounce=1.0, stop_event=None):
+    """
+    Poll a wallpaper source and call on_change when the image actually changes.
+
+    Each poll only resolves the path and stats the file, so the loop is essentially idle
+    between changes. A change must be stable for `debounce` seconds before it is handled,
+    which collapses bursts of writes (e.g. slideshow transitions) into one regeneration.
+    Files whose content hash matches the last processed image are ignored.
+
+    Args:
+        source (callable): Returns the current wallpaper path
+        on_change (callable): Called with the new image path
+        interval (float): Seconds between polls
+        debounce (float): Seconds a new signature must stay unchanged before handling it
+        stop_event (threading.Event): Optional event that ends the loop when set
+    """
+    stop_event = stop_event or threading.Event()
+    handled_signature = None
+    handled_hash = None
+    pending_signature = None
+    pending_since = 0.0
+
+    while not stop_event.is_set():
+        current = signature(source())
+
+        if current is None or current == handled_signature:
+            pending_signature = None
+        elif current != pending_signature:
+            # New change seen: start (or restart) the debounce window
+            pending_signature = current
+            pending_since = time.monotonic()
+        elif time.monotonic() - pending_since >= debounce:
+            pending_signature = None
+            handled_signature = current
+            try:
+                content_hash = hash_file(current[0])
+            except OSError as e:
+                print(f"Could not read wallpaper {current[0]}: {e}")
+                content_hash = None
+
+            if content_hash and content_hash != handled_hash:
+                handled_hash = content_hash
+                print("\nWallpaper changed: " + current[0])
+                try:
+                    on_change(current[0])
+                except (Exception, SystemExit) as e:
+                    print(f"Error generating colors: {e}")
+
+        # While a change is pending, poll at the debounce granularity instead of the idle interval
+        stop_event.wait(interval if pending_signature is None else min(interval, max(debounce / 2, 0.05)))
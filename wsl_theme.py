@@ -0,0 +1,72 @@
+"""
+WSL Theme Application for Prismo
+Applies the wpgtk theme to several WSL distros concurrently, so the total time is that of
+the slowest distro rather than the sum of all of them
+"""
+
+import asyncio
+from asyncio.subprocess import DEVNULL, PIPE
+
+
+async def _run(cmd, stderr=DEVNULL):
+    """Run a shell command, returning (exit code, stderr bytes)"""
+    process = await asyncio.create_subprocess_shell(cmd, stdout=DEVNULL, stderr=stderr)
+    _, err = await process.communicate()
+    return process.returncode, err or b""
+
+
+async def _apply_distro(distro, wsl_img, executable, limit):
+    """
+    Check one distro and apply the theme to it.
+
+    Returns:
+        tuple or None: (skipped, error message), or None if the theme was applied
+    """
+    async with limit:
+        # First, check if the distro exists
+        code, stderr = await _run(f'{executable} -d {distro} -- echo "test"', PIPE)
+        if code != 0 or b"WSL_E_DISTRO_NOT_FOUND" in stderr:
+            return True, f"Distro '{distro}' not found or not installed"
+
+        # Check if wpg is installed
+        code, _ = await _run(f'{executable} -d {distro} -- command -v wpg')
+        if code != 0:
+            return True, "wpg (wpgtk) is not installed in this distro"
+
+        # Apply wpgtk theme
+        code, stderr = await _run(f'{executable} -d {distro} -- wpg -s "{wsl_img}"', PIPE)
+        if code != 0:
+            return False, f"wpg command failed: {stderr.decode('utf-8', errors='ignore').strip()}"
+
+        # Clean up old schemes (errors here are non-fatal)
+        img_name = wsl_img.replace("/", "_").replace(" ", "\\ ")
+        await _run(f'{executable} -d {distro} -- rm -f ~/.config/wpg/schemes/{img_name[:img_name.rfind(".")]}* 2>/dev/null')
+        return None
+
+
+async def _apply_all(distros, wsl_img, executable, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    outcomes = await asyncio.gather(*(_apply_distro(distro, wsl_img, executable, limit) for distro in distros),
+                                    return_exceptions=True)
+    return [(False, str(outcome)) if isinstance(outcome, BaseException) else outcome for outcome in outcomes]
+
+
+def apply_wsl_themes(distros, wsl_img, executable="wsl", concurrency=4):
+    """
+    Apply the wpgtk theme for an image to WSL distros in parallel.
+
+    Args:
+        distros (list): WSL distro names
+        wsl_img (str): Image path as seen from inside WSL (/mnt/c/...)
+        executable (str): WSL launcher to run (a stub script can stand in for it in tests)
+        concurrency (int): Maximum number of distros processed at once
+
+    Returns:
+        list: None (applied) or (skipped, error message) per distro, in the order given;
+              skipped distros are missing or don't have wpgtk installed
+    """
+    if not distros:
+        return []
+    if " " in executable and not executable.startswith('"'):
+        executable = f'"{executable}"'
+    return asyncio.run(_apply_all(distros, wsl_img, executable, max(int(concurrency or 1), 1)))